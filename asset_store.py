@@ -0,0 +1,157 @@
+import os
+import time
+import hashlib
+import tempfile
+from PIL import Image
+
+# Content-addressed disk cache for downloaded images (logos, headshots, flags).
+# refs/<hash of url + variant> holds the sha256 of the stored object;
+# objects/<sha256> holds either the original download or a pre-decoded,
+# pre-resized RGBA variant. Identical images (e.g. the default headshot
+# silhouette) are only stored once.
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", ".cache/assets")
+ASSET_CACHE_MAX_MB = float(os.getenv("ASSET_CACHE_MAX_MB") or "200")
+ASSET_CACHE_TTL_DAYS = float(os.getenv("ASSET_CACHE_TTL_DAYS") or "7")
+
+# Prune after this many writes so the size cap holds without walking the tree on every put
+PRUNE_EVERY = 50
+_writes_since_prune = 0
+
+def _ref_path(url, variant):
+    key = hashlib.sha256(f"{url}#{variant}".encode()).hexdigest()
+    return os.path.join(ASSET_CACHE_DIR, "refs", key[:2], key)
+
+def _object_path(digest):
+    return os.path.join(ASSET_CACHE_DIR, "objects", digest[:2], digest)
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def get(url, variant="raw"):
+    ref = _ref_path(url, variant)
+    try:
+        if time.time() - os.path.getmtime(ref) > ASSET_CACHE_TTL_DAYS * 86400:
+            os.remove(ref)
+            return None
+        with open(ref) as f:
+            obj = _object_path(f.read().strip())
+        with open(obj, "rb") as f:
+            data = f.read()
+        # Touch the object so size-cap eviction drops the least recently used first
+        os.utime(obj)
+        return data
+    except OSError:
+        return None
+
+def put(url, data, variant="raw"):
+    global _writes_since_prune
+    digest = hashlib.sha256(data).hexdigest()
+    obj = _object_path(digest)
+    try:
+        if not os.path.exists(obj):
+            _atomic_write(obj, data)
+        _atomic_write(_ref_path(url, variant), digest.encode())
+    except OSError:
+        return
+    _writes_since_prune += 1
+    if _writes_since_prune >= PRUNE_EVERY:
+        prune()
+
+def _variant_name(size):
+    return f"{size[0]}x{size[1]}"
+
+def encode_variant(img):
+    header = f"{img.mode} {img.width} {img.height}\n".encode()
+    return header + img.tobytes()
+
+def decode_variant(data):
+    header, _, pixels = data.partition(b"\n")
+    mode, w, h = header.decode().split()
+    return Image.frombytes(mode, (int(w), int(h)), pixels)
+
+def get_images(url, sizes):
+    """
+    Returns {size: Image} for every requested (w, h) size, or None if any
+    variant is missing or expired.
+    """
+    variants = {}
+    for size in sizes:
+        data = get(url, _variant_name(size))
+        if data is None:
+            return None
+        try:
+            variants[size] = decode_variant(data)
+        except Exception:
+            return None
+    return variants
+
+def put_images(url, variants):
+    for size, img in variants.items():
+        put(url, encode_variant(img), _variant_name(size))
+
+def _walk(subdir):
+    root = os.path.join(ASSET_CACHE_DIR, subdir)
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                yield path, os.stat(path)
+            except OSError:
+                continue
+
+def prune():
+    """
+    Drops expired refs, objects nothing refers to any more, and then the least
+    recently used objects until the store fits under ASSET_CACHE_MAX_MB.
+    """
+    global _writes_since_prune
+    _writes_since_prune = 0
+    now = time.time()
+    ttl = ASSET_CACHE_TTL_DAYS * 86400
+
+    live = set()
+    for path, st in _walk("refs"):
+        if now - st.st_mtime > ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                live.add(f.read().strip())
+        except OSError:
+            continue
+
+    objects = []
+    for path, st in _walk("objects"):
+        if os.path.basename(path) not in live:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        objects.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in objects)
+    limit = ASSET_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(objects):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
@@ -0,0 +1,237 @@
+"""
+Offline benchmark for the image_generator renderers.
+
+Runs every generate_* function against the JSON payloads in fixtures/ with
+logos, headshots and flags generated locally, so no network is touched.
+Each renderer is timed in three states:
+
+  cold    - logo cache and atlas, render cache, text metrics, static templates,
+            fonts and asset store all empty, on a fresh render pool
+  warm    - assets cached, render cache cleared (the cost of a real re-render)
+  cached  - render cache hit
+
+Usage:
+  python bench_renderers.py [-n 20] [-o bench_results.json] [--compare old.json]
+                            [--encodings png png-palette webp]
+
+--encodings re-runs the warm renders once per output format and reports the
+mean encode time against the encoded size.
+
+Peak memory is the tracemalloc peak for one call. Pillow allocates pixel
+buffers outside the Python allocator, so it mostly measures the Python side;
+max_rss_kib in the results covers the whole process.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import date
+
+import PIL
+
+import asset_store
+import image_generator
+import metrics
+from mock_upstream import stub_image
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MODES = ("cold", "warm", "cached")
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+def load_olympic_fixture():
+    data = load_fixture("olympic_schedule.json")
+    games = [dict(g, date=date.fromisoformat(g["date"])) for g in data["games"]]
+    return games, date.fromisoformat(data["target_date"])
+
+async def stub_fetch_bytes(url):
+    return stub_image(url)
+
+def reset_caches(mode):
+    if mode == "cached":
+        return
+    image_generator.RENDER_CACHE.clear()
+    if mode == "cold":
+        image_generator.LOGO_CACHE.clear()
+        image_generator.LOGO_ATLAS = None
+        image_generator.text_width.cache_clear()
+        for template in (image_generator.player_card_template, image_generator.standings_template,
+                         image_generator.conference_template, image_generator.next_games_template,
+                         image_generator.olympic_schedule_template):
+            template.cache_clear()
+        shutil.rmtree(asset_store.ASSET_CACHE_DIR, ignore_errors=True)
+        # Render threads and RENDER_POOL=process workers keep their own fonts, templates
+        # and text metrics, so cold runs get a new pool. One worker is started here so
+        # spawning it isn't timed as rendering.
+        image_generator.shutdown_render_executor()
+        image_generator.get_render_executor().submit(int).result()
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+async def bench_case(call, mode, iterations):
+    # One untimed call so "warm" and "cached" start from a populated state
+    if mode != "cold":
+        await call()
+
+    times = []
+    peaks = []
+    size = None
+    for _ in range(iterations):
+        reset_caches(mode)
+        tracemalloc.start()
+        start = time.perf_counter()
+        buffer = await call()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        times.append(elapsed * 1000)
+        peaks.append(peak)
+        size = len(buffer.getvalue()) if buffer else None
+
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(times, 50), 3),
+        "p95_ms": round(percentile(times, 95), 3),
+        "mean_ms": round(sum(times) / len(times), 3),
+        "peak_kib": round(max(peaks) / 1024, 1),
+        "bytes": size,
+    }
+
+def build_cases():
+    standings = load_fixture("standings.json")
+    skater = load_fixture("player_landing.json")
+    goalie = load_fixture("goalie_landing.json")
+    next_games = load_fixture("next_games.json")
+    olympic_games, olympic_date = load_olympic_fixture()
+
+    return {
+        "player_card": lambda: image_generator.generate_player_card(skater),
+        "player_card_goalie": lambda: image_generator.generate_player_card(goalie),
+        "standings": lambda: image_generator.generate_standings_image(standings),
+        "conference": lambda: image_generator.generate_conference_image(standings),
+        "next_games": lambda: image_generator.generate_next_games_image(next_games),
+        "olympic_schedule": lambda: image_generator.generate_olympic_schedule_image(olympic_games, olympic_date),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+async def run_benchmarks(iterations, only=None):
+    cases = build_cases()
+    results = {}
+    for name, call in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = {}
+        for mode in MODES:
+            results[name][mode] = await bench_case(call, mode, iterations)
+            r = results[name][mode]
+            print(f"{name:<20} {mode:<7} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  "
+                  f"peak {r['peak_kib']:>9.1f} KiB  {r['bytes'] or 0:>8} B")
+    return results
+
+async def run_encodings(formats, iterations, only=None):
+    # Encode time comes from the timings the render worker reports back
+    cases = build_cases()
+    default_format = image_generator.IMAGE_FORMAT
+    results = {}
+    try:
+        for image_format in formats:
+            image_generator.IMAGE_FORMAT = image_format
+            results[image_format] = {}
+            for name, call in cases.items():
+                if only and name not in only:
+                    continue
+                metrics.ENCODE_SECONDS.values.clear()
+                r = await bench_case(call, "warm", iterations)
+                observed = list(metrics.ENCODE_SECONDS.values.values())
+                count = sum(e[2] for e in observed)
+                encode_ms = sum(e[1] for e in observed) / count * 1000 if count else 0.0
+                results[image_format][name] = {"encode_mean_ms": round(encode_ms, 3), "p50_ms": r["p50_ms"], "bytes": r["bytes"]}
+                print(f"{image_format:<12} {name:<20} encode {encode_ms:>8.2f} ms  {r['bytes'] or 0:>8} B")
+    finally:
+        image_generator.IMAGE_FORMAT = default_format
+    return results
+
+async def run_all(args):
+    try:
+        results = await run_benchmarks(args.iterations, args.only)
+        encodings = await run_encodings(args.encodings, args.iterations, args.only) if args.encodings else None
+    finally:
+        image_generator.shutdown_render_executor()
+    return results, encodings
+
+def compare(current, baseline):
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} (p50 / p95, negative is faster):")
+    for name, modes in current["results"].items():
+        for mode, r in modes.items():
+            old = baseline.get("results", {}).get(name, {}).get(mode)
+            if not old:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms"):
+                delta = (r[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                deltas.append(f"{old[key]:.2f} -> {r[key]:.2f} ms ({delta:+.1f}%)")
+            print(f"{name:<20} {mode:<7} " + "  ".join(deltas))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image renderers against local fixtures.")
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="FILE", help="previous results file to diff against")
+    parser.add_argument("--only", nargs="*", help="renderer names to run (default: all)")
+    parser.add_argument("--encodings", nargs="*", choices=sorted(image_generator.IMAGE_EXTENSIONS),
+                        help="also compare these output formats")
+    args = parser.parse_args()
+
+    # Stub the network and keep the asset store out of the real cache directory
+    image_generator.fetch_bytes = stub_fetch_bytes
+    asset_store.ASSET_CACHE_DIR = tempfile.mkdtemp(prefix="nhl-bench-assets-")
+    try:
+        results, encodings = asyncio.run(run_all(args))
+    finally:
+        shutil.rmtree(asset_store.ASSET_CACHE_DIR, ignore_errors=True)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "render_pool": image_generator.RENDER_POOL,
+        "font": image_generator.get_font_path(),
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "image_format": image_generator.IMAGE_FORMAT,
+        "results": results,
+    }
+    if encodings:
+        report["encodings"] = encodings
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
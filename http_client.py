@@ -0,0 +1,353 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import aiohttp
+from collections import OrderedDict
+import metrics
+import profiling
+
+# One long-lived client shared by nhl_api and image_generator so every command
+# reuses warm keep-alive connections instead of opening fresh TCP/TLS sessions.
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# Total connection cap and per-host cap (api-web.nhle.com, espncdn, flagcdn, ...)
+MAX_CONNECTIONS = 100
+MAX_CONNECTIONS_PER_HOST = 10
+KEEPALIVE_TIMEOUT = 60
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5, sock_read=10)
+
+# The JSON APIs answer quickly when healthy, so they get tighter budgets than the CDNs
+HOST_TIMEOUTS = {
+    "api-web.nhle.com": aiohttp.ClientTimeout(total=8, connect=3, sock_read=6),
+    "site.api.espn.com": aiohttp.ClientTimeout(total=6, connect=3, sock_read=5),
+    "sports.core.api.espn.com": aiohttp.ClientTimeout(total=6, connect=3, sock_read=5),
+}
+
+# Transient failures (connection errors, timeouts, these statuses) are retried with
+# full-jitter exponential backoff. Each host earns RETRY_BUDGET_RATIO retries per
+# request, capped at RETRY_BUDGET_MAX, so an outage can't multiply the load on it.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MAX = 10
+# Cap on one request's attempts and backoff together, so a hung host hands over to
+# the stale fallback after a few seconds rather than retries x per-host timeout.
+# Never shorter than a single attempt's own total timeout (15s for the CDNs).
+REQUEST_DEADLINE = 8.0
+
+# After BREAKER_FAILURE_THRESHOLD consecutive failures a host's breaker opens and
+# requests to it fail fast for BREAKER_COOLDOWN seconds before a single probe is let through.
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+
+# Last good payload of uncached JSON URLs, served while their host is unavailable.
+# TTL-cached URLs fall back to their (expired) RESPONSE_CACHE entry instead.
+LAST_GOOD_SIZE = 256
+LAST_GOOD = OrderedDict()
+
+# When set (e.g. http://127.0.0.1:8089), every upstream request goes to
+# {UPSTREAM_BASE_URL}/{host}/{path} instead, as served by mock_upstream.py.
+UPSTREAM_BASE_URL = os.getenv("UPSTREAM_BASE_URL", "").rstrip("/")
+
+_session = None
+
+# URL -> {"data", "expires", "etag", "last_modified"}, least recently used first.
+# Per-player and per-date URLs keep arriving, so the oldest are evicted past the cap.
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE = OrderedDict()
+CACHE_STATS = {"hits": 0, "misses": 0, "revalidated": 0}
+
+UPSTREAM_RETRIES = metrics.counter("nhl_bot_upstream_retries_total", "Upstream request retries", ("host",))
+UPSTREAM_REJECTED = metrics.counter("nhl_bot_upstream_rejected_total", "Requests failed fast by an open circuit breaker", ("host",))
+UPSTREAM_STALE = metrics.counter("nhl_bot_upstream_stale_served_total", "Last good payloads served because the upstream was unavailable", ("host",))
+
+class CircuitBreaker:
+    __slots__ = ("failures", "opened_at", "probing")
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= BREAKER_COOLDOWN:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            # Exactly one request probes the host; everyone else keeps failing fast
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self, probe=False):
+        # probe: this was the half-open probe, so the host is still down
+        self.failures += 1
+        if probe or self.failures >= BREAKER_FAILURE_THRESHOLD:
+            self.opened_at = time.monotonic()
+        if probe:
+            self.probing = False
+
+class RetryBudget:
+    __slots__ = ("tokens",)
+
+    def __init__(self):
+        self.tokens = RETRY_BUDGET_MAX
+
+    def deposit(self):
+        self.tokens = min(RETRY_BUDGET_MAX, self.tokens + RETRY_BUDGET_RATIO)
+
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+# host -> CircuitBreaker / RetryBudget
+BREAKERS = {}
+RETRY_BUDGETS = {}
+
+def host_of(url: str):
+    return url.split("://", 1)[-1].split("/", 1)[0]
+
+def get_breaker(host):
+    breaker = BREAKERS.get(host)
+    if breaker is None:
+        breaker = BREAKERS[host] = CircuitBreaker()
+    return breaker
+
+def get_retry_budget(host):
+    budget = RETRY_BUDGETS.get(host)
+    if budget is None:
+        budget = RETRY_BUDGETS[host] = RetryBudget()
+    return budget
+
+def breaker_states():
+    return {host: breaker.state for host, breaker in BREAKERS.items()}
+
+_BREAKER_LEVELS = {"closed": 0, "half_open": 1, "open": 2}
+metrics.callback("nhl_bot_circuit_state", "Circuit breaker state per upstream host (0 closed, 1 half-open, 2 open)",
+                 "gauge", ("host",), lambda: {(host,): _BREAKER_LEVELS[state] for host, state in breaker_states().items()})
+
+def get_session():
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONNECTIONS,
+            limit_per_host=MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            timeout=DEFAULT_TIMEOUT,
+        )
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+_ID_SEGMENT = re.compile(r"^(\d{4,}|[A-Z]{2,3})$")
+_FILE_SEGMENT = re.compile(r"\.(png|jpe?g|svg|gif)$", re.IGNORECASE)
+
+def endpoint_label(url: str):
+    """
+    Host plus path with ids, team codes and file names collapsed, so metrics stay
+    per endpoint: api-web.nhle.com/v1/roster/:id/current.
+    """
+    rest = url.split("://", 1)[-1].split("?", 1)[0]
+    host, _, path = rest.partition("/")
+    segments = []
+    for segment in path.split("/"):
+        if _FILE_SEGMENT.search(segment):
+            segments.append(":file")
+        elif _ID_SEGMENT.search(segment):
+            segments.append(":id")
+        else:
+            segments.append(segment)
+    return "/".join([host] + segments)
+
+def upstream_url(url: str):
+    if not UPSTREAM_BASE_URL:
+        return url
+    for scheme in ("https://", "http://"):
+        if url.startswith(scheme):
+            return f"{UPSTREAM_BASE_URL}/{url[len(scheme):]}"
+    return url
+
+async def _get(session, url, headers=None, timeout=None):
+    """
+    Issues one GET and reads the body, recording latency, status and bytes.
+    Returns (status, body, response headers).
+    """
+    endpoint = endpoint_label(url)
+    start = time.perf_counter()
+    status = "error"
+    with profiling.span(f"fetch {endpoint}") as span:
+        try:
+            async with session.get(upstream_url(url), headers=headers, timeout=timeout or DEFAULT_TIMEOUT) as response:
+                body = await response.read() if response.status == 200 else b""
+                # Only counted as a status once the body has arrived; timeouts stay "error"
+                status = response.status
+                metrics.UPSTREAM_BYTES.inc(len(body), endpoint=endpoint)
+                span.set(bytes=len(body))
+                return status, body, response.headers
+        finally:
+            span.set(status=status)
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+            metrics.UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=status)
+
+def request_deadline(host):
+    return max(REQUEST_DEADLINE, (HOST_TIMEOUTS.get(host) or DEFAULT_TIMEOUT).total)
+
+async def _request(url, headers=None):
+    """
+    GETs url with its host's timeout, retrying transient failures while the host's
+    retry budget and request_deadline(host) allow. Returns (status, body, response headers),
+    or None if the host's breaker is open or every attempt raised.
+    """
+    host = host_of(url)
+    breaker = get_breaker(host)
+    budget = get_retry_budget(host)
+    budget.deposit()
+    session = get_session()
+    deadline = time.monotonic() + request_deadline(host)
+    result = None
+
+    for attempt in range(RETRY_ATTEMPTS):
+        # Only the request that takes the half-open slot may release it
+        probe = breaker.state == "half_open"
+        if not breaker.allow():
+            UPSTREAM_REJECTED.inc(host=host)
+            profiling.add_span(f"circuit_open {host}", time.perf_counter(), 0)
+            return result
+        try:
+            remaining = deadline - time.monotonic()
+            result = await asyncio.wait_for(_get(session, url, headers, HOST_TIMEOUTS.get(host)), remaining)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            breaker.record_failure(probe)
+            result = None
+        except BaseException:
+            # Cancellation, a closed session, a bad body... the error propagates, but
+            # the probe slot must be given back or the host is never probed again
+            if probe:
+                breaker.probing = False
+            raise
+        else:
+            if result[0] not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return result
+            breaker.record_failure(probe)
+
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+        if attempt + 1 == RETRY_ATTEMPTS or time.monotonic() + delay >= deadline or not budget.withdraw():
+            break
+        UPSTREAM_RETRIES.inc(host=host)
+        with profiling.span(f"backoff {host}", attempt=attempt + 1):
+            await asyncio.sleep(delay)
+    return result
+
+def _unavailable(result):
+    return result is None or result[0] in RETRYABLE_STATUSES
+
+def _serve_stale(url, data):
+    UPSTREAM_STALE.inc(host=host_of(url))
+    profiling.add_span(f"stale {endpoint_label(url)}", time.perf_counter(), 0)
+    return data
+
+def _remember(url, data):
+    LAST_GOOD[url] = data
+    LAST_GOOD.move_to_end(url)
+    while len(LAST_GOOD) > LAST_GOOD_SIZE:
+        LAST_GOOD.popitem(last=False)
+
+async def fetch_json(url: str, ttl: float = None):
+    """
+    GETs a JSON document through the shared session.
+    When ttl (seconds) is given the response is cached by URL; once it expires
+    the entry is revalidated with ETag/Last-Modified before being refetched.
+    While the upstream is unavailable (open breaker, timeouts, 5xx) the last good
+    payload for the URL is returned if there is one.
+    Returns None on any other non-200 response.
+    """
+    if not ttl:
+        result = await _request(url)
+        if _unavailable(result) and url in LAST_GOOD:
+            return _serve_stale(url, LAST_GOOD[url])
+        if result is None or result[0] != 200:
+            return None
+        data = json.loads(result[1])
+        _remember(url, data)
+        return data
+
+    now = time.monotonic()
+    entry = RESPONSE_CACHE.get(url)
+    if entry:
+        RESPONSE_CACHE.move_to_end(url)
+    if entry and entry["expires"] > now:
+        CACHE_STATS["hits"] += 1
+        if profiling.active():
+            profiling.add_span(f"cached {endpoint_label(url)}", time.perf_counter(), 0)
+        return entry["data"]
+
+    headers = {}
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    result = await _request(url, headers)
+    if _unavailable(result) and entry:
+        return _serve_stale(url, entry["data"])
+    if result is None:
+        return None
+    status, body, response_headers = result
+    if status == 304 and entry:
+        CACHE_STATS["revalidated"] += 1
+        entry["expires"] = time.monotonic() + ttl
+        return entry["data"]
+    CACHE_STATS["misses"] += 1
+    if status != 200:
+        return None
+    data = json.loads(body)
+    RESPONSE_CACHE[url] = {
+        "data": data,
+        "expires": time.monotonic() + ttl,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+    }
+    RESPONSE_CACHE.move_to_end(url)
+    while len(RESPONSE_CACHE) > RESPONSE_CACHE_SIZE:
+        RESPONSE_CACHE.popitem(last=False)
+    return data
+
+async def fetch_bytes(url: str):
+    # Images have their own disk cache, so there's no stale fallback here
+    result = await _request(url)
+    if result is None or result[0] != 200:
+        return None
+    return result[1]
+
+metrics.register_cache("response", CACHE_STATS, lambda: len(RESPONSE_CACHE))
@@ -1,8 +1,21 @@
 import io
-import aiohttp
+import os
+import json
+import time
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from PIL import Image, ImageDraw, ImageFont
+from http_client import fetch_bytes
+import asset_store
+import metrics
+import profiling
+from singleflight import single_flight
 
 EASTERN = ZoneInfo("America/New_York")
 
@@ -15,26 +28,209 @@ FONT_PATHS = [
     "/usr/share/fonts/Adwaita/AdwaitaSans-Bold.ttf",
 ]
 
+# team abbr -> {size: RGBA logo}. Logos are downscaled once on ingest to the sizes
+# the renderers draw them at (table rows and the large next-game/player-card logo).
+LOGO_ROW_SIZE = 32
+LOGO_LARGE_SIZE = 100
+LOGO_SIZES = (LOGO_ROW_SIZE, LOGO_LARGE_SIZE)
 LOGO_CACHE = {}
+LOGO_CACHE_STATS = {"hits": 0, "misses": 0}
 
-def get_font(size):
+# Pillow drawing and PNG encoding run off the event loop in this pool.
+# RENDER_POOL is "thread" (default) or "process"; RENDER_WORKERS caps the pool size.
+RENDER_POOL = os.getenv("RENDER_POOL", "thread")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS") or "0") or None
+
+_render_executor = None
+
+def get_render_executor():
+    global _render_executor
+    if _render_executor is None:
+        if RENDER_POOL == "process":
+            _render_executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        else:
+            _render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+    return _render_executor
+
+def shutdown_render_executor():
+    global _render_executor
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=False, cancel_futures=True)
+    _render_executor = None
+
+def render_and_encode(image_format, render_fn, *args):
+    # Runs inside the render worker. Timings travel back with the bytes because a
+    # process worker can't record into this process's metrics or profile.
+    _font_registry.load_seconds = 0.0
+    start = time.perf_counter()
+    img = render_fn(*args)
+    drawn = time.perf_counter()
+    data = encode_image(img, image_format)
+    return data, {"draw": drawn - start, "encode": time.perf_counter() - drawn, "font_load": _font_registry.load_seconds}
+
+async def run_render(render_fn, *args):
+    # render_fn is a plain module-level function returning the drawn image,
+    # so it can be shipped to either a thread or a process worker.
+    # The same kind cached_render uses, e.g. render_next_games_image -> next_games
+    kind = render_fn.__name__.removeprefix("render_").removesuffix("_image")
+    loop = asyncio.get_running_loop()
+    with profiling.span(f"render {kind}") as span:
+        image_format = image_format_for(kind)
+        data, timings = await loop.run_in_executor(get_render_executor(), render_and_encode, image_format, render_fn, *args)
+        if profiling.active():
+            # Lay the worker's phases out backwards from the moment its result arrived
+            done = time.perf_counter()
+            draw = profiling.add_span("draw", done - timings["encode"] - timings["draw"], timings["draw"])
+            profiling.add_span("font_load", draw.start, timings["font_load"], parent=draw)
+            profiling.add_span("encode", done - timings["encode"], timings["encode"], bytes=len(data))
+            span.set(queued_ms=round((span.duration - timings["draw"] - timings["encode"]) * 1000, 3))
+    metrics.RENDER_SECONDS.observe(timings["draw"], kind=kind)
+    metrics.ENCODE_SECONDS.observe(timings["encode"], kind=kind)
+    metrics.ENCODED_BYTES.observe(len(data), kind=kind, format=image_format)
+    return io.BytesIO(data)
+
+# Output encoding, applied in the render worker after drawing:
+#   png          - plain PNG at PNG_COMPRESS_LEVEL (PNG_OPTIMIZE=1 adds an extra optimizing pass)
+#   png-palette  - adaptive palette of up to PALETTE_COLORS colours, then PNG. These canvases are
+#                  flat dark backgrounds with a few accent colours, so this is much smaller.
+#                  Player cards carry a photo headshot that bands when quantized, so they stay png
+#   webp         - lossless WebP at effort WEBP_METHOD (0-6)
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "png")
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL") or "6")
+PNG_OPTIMIZE = os.getenv("PNG_OPTIMIZE", "0") == "1"
+PALETTE_COLORS = int(os.getenv("PALETTE_COLORS") or "256")
+WEBP_METHOD = int(os.getenv("WEBP_METHOD") or "4")
+IMAGE_EXTENSIONS = {"png": "png", "png-palette": "png", "webp": "webp"}
+PALETTE_EXCLUDED_KINDS = {"player_card"}
+
+def image_format_for(kind):
+    if IMAGE_FORMAT == "png-palette" and kind in PALETTE_EXCLUDED_KINDS:
+        return "png"
+    return IMAGE_FORMAT
+
+def image_extension():
+    return IMAGE_EXTENSIONS.get(IMAGE_FORMAT, "png")
+
+# Encoded images keyed by a hash of the fields each renderer reads. Bump
+# RENDERER_VERSION whenever a renderer's output changes for the same input.
+RENDERER_VERSION = 2
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE") or "64")
+RENDER_CACHE = OrderedDict()
+RENDER_CACHE_STATS = {"hits": 0, "misses": 0, "coalesced": 0}
+
+def render_fingerprint(kind, payload):
+    blob = json.dumps([kind, RENDERER_VERSION, IMAGE_FORMAT, payload], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+async def cached_render(kind, payload, build):
+    """
+    Returns the cached encoding for (kind, payload) or awaits build() to
+    produce one. build is a zero-argument coroutine function returning
+    (buffer, complete); complete is False when an asset (logo, headshot, flag)
+    failed to load. Such renders are returned but not cached, so the next call
+    retries the download. Concurrent misses for the same key share a single
+    render; only the caller that starts it counts as a miss, the rest as coalesced.
+    """
+    key = render_fingerprint(kind, payload)
+    data = RENDER_CACHE.get(key)
+    if data is not None:
+        RENDER_CACHE.move_to_end(key)
+        RENDER_CACHE_STATS["hits"] += 1
+        profiling.add_span(f"render_cache_hit {kind}", time.perf_counter(), 0)
+        return io.BytesIO(data)
+
+    led = False
+
+    async def build_and_store():
+        nonlocal led
+        led = True
+        RENDER_CACHE_STATS["misses"] += 1
+        buffer, complete = await build()
+        if buffer is None:
+            return None
+        if complete:
+            RENDER_CACHE[key] = buffer.getvalue()
+            while len(RENDER_CACHE) > RENDER_CACHE_SIZE:
+                RENDER_CACHE.popitem(last=False)
+        return buffer.getvalue()
+
+    data = await single_flight(("render", key), build_and_store)
+    if not led:
+        RENDER_CACHE_STATS["coalesced"] += 1
+    # Every caller gets its own buffer since discord.File consumes it
+    return io.BytesIO(data) if data is not None else None
+
+def render_cached(key):
+    # key is a render_fingerprint; False while the image is missing an asset
+    return key in RENDER_CACHE
+
+metrics.register_cache("render", RENDER_CACHE_STATS, lambda: len(RENDER_CACHE))
+metrics.register_cache("logo", LOGO_CACHE_STATS, lambda: len(LOGO_CACHE))
+
+def encode_image(img, image_format=None):
+    image_format = image_format or IMAGE_FORMAT
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        img.save(buffer, format="WEBP", lossless=True, method=WEBP_METHOD)
+    else:
+        if image_format == "png-palette":
+            # No dithering: it would speckle the flat backgrounds and defeat compression
+            img = img.convert("RGB").quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        img.save(buffer, format="PNG", optimize=PNG_OPTIMIZE, compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+# FreeType faces aren't safe to share between render threads, so each thread keeps
+# its own size -> font registry. The font path itself is resolved once per process.
+_font_registry = threading.local()
+
+@lru_cache(maxsize=1)
+def get_font_path():
     for path in FONT_PATHS:
         try:
-            return ImageFont.truetype(path, size)
+            ImageFont.truetype(path, 10)
+            return path
         except:
             continue
-    return ImageFont.load_default()
+    return None
+
+def get_font(size):
+    fonts = getattr(_font_registry, "fonts", None)
+    if fonts is None:
+        fonts = _font_registry.fonts = {}
+    font = fonts.get(size)
+    if font is None:
+        start = time.perf_counter()
+        path = get_font_path()
+        font = ImageFont.truetype(path, size) if path else ImageFont.load_default()
+        fonts[size] = font
+        _font_registry.load_seconds = getattr(_font_registry, "load_seconds", 0.0) + time.perf_counter() - start
+    return font
+
+@lru_cache(maxsize=4096)
+def text_width(text, size):
+    bbox = get_font(size).getbbox(text)
+    return bbox[2] - bbox[0]
+
+def truncate_text(text, size, max_width, ellipsis="…"):
+    if text_width(text, size) <= max_width:
+        return text
+    # Longest prefix that still fits with the ellipsis appended
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if text_width(text[:mid] + ellipsis, size) <= max_width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + ellipsis
 
-def wrap_text(text, font, max_width):
+def wrap_text(text, size, max_width):
     if not text:
         return []
     
     lines = []
     parts = text.split(",")
     current_line = ""
-    
-    dummy_img = Image.new('RGB', (1, 1))
-    dummy_draw = ImageDraw.Draw(dummy_img)
 
     for i, part in enumerate(parts):
         part = part.strip()
@@ -43,10 +239,7 @@ def wrap_text(text, font, max_width):
             
         test_line = (current_line + " " + display_part).strip() if current_line else display_part
         
-        bbox = dummy_draw.textbbox((0, 0), test_line, font=font)
-        w = bbox[2] - bbox[0]
-        
-        if w <= max_width:
+        if text_width(test_line, size) <= max_width:
             current_line = test_line
         else:
             if current_line:
@@ -57,15 +250,62 @@ def wrap_text(text, font, max_width):
         lines.append(current_line)
     return lines
 
+HEADSHOT_SIZE = (320, 320)
+FLAG_SIZE = (40, 24)
+
 async def fetch_image(url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                return await response.read()
-    return None
+    # Reads through the on-disk asset store before going to the CDN
+    if not url:
+        return None
+    data = await asyncio.to_thread(asset_store.get, url)
+    if data is None:
+        data = await fetch_bytes(url)
+        if data:
+            await asyncio.to_thread(asset_store.put, url, data)
+    return data
+
+def build_image_variants(data, sizes):
+    img = Image.open(io.BytesIO(data)).convert("RGBA")
+    return {size: img.resize(size, Image.LANCZOS) for size in sizes}
+
+async def load_image_variants(url, sizes):
+    """
+    Returns {(w, h): RGBA image} for url, served from the asset store when possible.
+    On a miss the image is downloaded, resized in the render pool and stored.
+    """
+    if not url:
+        return None
+    with profiling.span("asset_load", url=url):
+        return await single_flight(("image", url, tuple(sizes)), lambda: _load_image_variants(url, sizes))
+
+async def _load_image_variants(url, sizes):
+    with profiling.span("asset_store_read") as span:
+        variants = await asyncio.to_thread(asset_store.get_images, url, sizes)
+        span.set(hit=variants is not None)
+    if variants is not None:
+        return variants
+    data = await fetch_image(url)
+    if not data:
+        return None
+    loop = asyncio.get_running_loop()
+    try:
+        with profiling.span("resize"):
+            variants = await loop.run_in_executor(get_render_executor(), build_image_variants, data, sizes)
+    except Exception:
+        return None
+    with profiling.span("asset_store_write"):
+        await asyncio.to_thread(asset_store.put_images, url, variants)
+    return variants
+
+def build_tbd_logo_variants():
+    # A simple grey circle placeholder for TBD opponents
+    img = Image.new('RGBA', (100, 100), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([10, 10, 90, 90], fill=(60, 60, 60))
+    draw.text((50, 50), "?", font=get_font(40), fill=(255, 255, 255), anchor="mm")
+    return {size: img if size == 100 else img.resize((size, size), Image.LANCZOS) for size in LOGO_SIZES}
 
-async def get_team_logo(team_abbr):
+async def get_team_logo(team_abbr, size=LOGO_LARGE_SIZE):
     if not team_abbr:
         return None
     team_abbr = team_abbr.lower()
@@ -79,50 +319,172 @@ async def get_team_logo(team_abbr):
     }
     espn_abbr = espn_map.get(team_abbr, team_abbr)
     
-    if team_abbr == "tbd":
-        # Return a simple grey circle or placeholder for TBD
-        img = Image.new('RGBA', (100, 100), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        draw.ellipse([10, 10, 90, 90], fill=(60, 60, 60))
-        draw.text((50, 50), "?", font=get_font(40), fill=(255, 255, 255), anchor="mm")
-        return img
-
     if team_abbr in LOGO_CACHE:
-        return LOGO_CACHE[team_abbr]
+        LOGO_CACHE_STATS["hits"] += 1
+        return LOGO_CACHE[team_abbr][size]
+    LOGO_CACHE_STATS["misses"] += 1
+
+    if team_abbr == "tbd":
+        LOGO_CACHE[team_abbr] = build_tbd_logo_variants()
+        return LOGO_CACHE[team_abbr][size]
     
     url = f"https://a.espncdn.com/i/teamlogos/nhl/500/{espn_abbr}.png"
-    data = await fetch_image(url)
-    if data:
-        img = Image.open(io.BytesIO(data)).convert("RGBA")
-        LOGO_CACHE[team_abbr] = img
-        return img
+    variants = await load_image_variants(url, [(s, s) for s in LOGO_SIZES])
+    if variants:
+        LOGO_CACHE[team_abbr] = {s: variants[(s, s)] for s in LOGO_SIZES}
+        return LOGO_CACHE[team_abbr][size]
     return None
 
+async def get_team_logos(team_abbrs, size=LOGO_LARGE_SIZE):
+    abbrs = list(dict.fromkeys(a for a in team_abbrs if a))
+    logos = await asyncio.gather(*(get_team_logo(a, size) for a in abbrs))
+    return {a: logo for a, logo in zip(abbrs, logos) if logo}
+
+async def prefetch_team_logos(team_abbrs):
+    # Warms every logo concurrently (e.g. all 32 teams when the bot becomes ready)
+    results = await asyncio.gather(*(get_team_logo(a) for a in team_abbrs), return_exceptions=True)
+    return sum(1 for r in results if r is not None and not isinstance(r, Exception))
+
+def logo_cache_footprint():
+    # Approximate decoded size in bytes of every cached logo variant
+    total = 0
+    for variants in LOGO_CACHE.values():
+        for img in variants.values():
+            total += img.width * img.height * len(img.getbands())
+    return total
+
+# Every cached row-size logo packed side by side into one RGBA sheet, so table
+# rows composite straight from it. (cached abbrs, sheet, {ABBR: (x, y)}); rebuilt
+# whenever the set of cached logos changes.
+LOGO_ATLAS = None
+
+def build_logo_atlas(logos):
+    # logos: {abbr: RGBA logo at LOGO_ROW_SIZE}
+    abbrs = sorted(logos)
+    sheet = Image.new('RGBA', (max(len(abbrs), 1) * LOGO_ROW_SIZE, LOGO_ROW_SIZE), (0, 0, 0, 0))
+    offsets = {}
+    for i, abbr in enumerate(abbrs):
+        offsets[abbr.upper()] = (i * LOGO_ROW_SIZE, 0)
+        sheet.paste(logos[abbr], offsets[abbr.upper()])
+    return sheet, offsets
+
+async def get_logo_atlas(team_abbrs):
+    """
+    Makes sure team_abbrs' logos are cached and returns (sheet, offsets) for
+    draw_team_row. Offsets are keyed by the upper-case abbreviation.
+    """
+    global LOGO_ATLAS
+    await get_team_logos(team_abbrs, LOGO_ROW_SIZE)
+    cached = frozenset(LOGO_CACHE)
+    if LOGO_ATLAS is None or LOGO_ATLAS[0] != cached:
+        with profiling.span("logo_atlas_build", logos=len(cached)):
+            sheet, offsets = build_logo_atlas({a: v[LOGO_ROW_SIZE] for a, v in LOGO_CACHE.items()})
+        LOGO_ATLAS = (cached, sheet, offsets)
+    return LOGO_ATLAS[1], LOGO_ATLAS[2]
+
+def player_card_fingerprint(data):
+    featured = data.get("featuredStats", {})
+    return {
+        "headshot": data.get("headshot"),
+        "team": data.get("currentTeamAbbrev"),
+        "firstName": data.get("firstName", {}).get("default", ""),
+        "lastName": data.get("lastName", {}).get("default", ""),
+        "number": data.get("sweaterNumber", ""),
+        "position": data.get("position", ""),
+        "teamName": data.get("fullTeamName", {}).get("default", ""),
+        "shootsCatches": data.get("shootsCatches"),
+        "height": data.get("heightInInches"),
+        "weight": data.get("weightInPounds"),
+        "season": featured.get("season"),
+        "stats": featured.get("regularSeason", {}).get("subSeason", {}),
+    }
+
 async def generate_player_card(data):
-    width, height = 500, 680
+    async def build():
+        headshots, logo = await asyncio.gather(
+            load_image_variants(data.get("headshot"), [HEADSHOT_SIZE]),
+            get_team_logo(data.get("currentTeamAbbrev")),
+        )
+        headshot = headshots[HEADSHOT_SIZE] if headshots else None
+        # No headshot URL or team is fine; a download that failed is not
+        complete = (headshot or not data.get("headshot")) and (logo or not data.get("currentTeamAbbrev"))
+        return await run_render(render_player_card, data, headshot, logo), complete
+    return await cached_render("player_card", player_card_fingerprint(data), build)
+
+PLAYER_CARD_SIZE = (500, 680)
+PLAYER_CARD_STATS_Y = 500
+
+# (label, featuredStats key) per stat column
+SKATER_STATS = (("GP", "gamesPlayed"), ("G", "goals"), ("A", "assists"), ("P", "points"),
+                ("+/-", "plusMinus"), ("SOG", "shots"))
+GOALIE_STATS = (("GP", "gamesPlayed"), ("W", "wins"), ("L", "losses"), ("OTL", "otLosses"),
+                ("GAA", "goalsAgainstAvg"), ("SV%", "savePctg"))
+STAT_FORMATS = {"goalsAgainstAvg": "{:.2f}", "savePctg": "{:.3f}"}
+
+def stat_columns(is_goalie):
+    # [(label, stat key, column center x)]
+    width = PLAYER_CARD_SIZE[0]
+    stats = GOALIE_STATS if is_goalie else SKATER_STATS
+    if is_goalie:
+        # Weighted widths for goalies: 4 narrow, 2 wide (GAA, SV%)
+        # 60*4 + 100*2 = 440
+        stat_widths = [60, 60, 60, 60, 100, 100]
+    else:
+        stat_width = (width - 60) // len(stats)
+        stat_widths = [stat_width] * len(stats)
+
+    columns = []
+    x_offset = 30
+    for (label, key), w in zip(stats, stat_widths):
+        columns.append((label, key, x_offset + w // 2))
+        x_offset += w
+    return columns
+
+# Static chrome (background, border, titles, headers) is drawn once per worker for
+# each layout and copied at the start of a render; only data-driven content is
+# drawn per request. Cached templates must never be drawn on directly.
+@lru_cache(maxsize=4)
+def player_card_template(variant):
+    # variant: "skater", "goalie" or "no_stats"
+    width, height = PLAYER_CARD_SIZE
     card = Image.new('RGB', (width, height), color=(20, 20, 20))
     draw = ImageDraw.Draw(card)
-    
-    headshot_url = data.get("headshot")
-    team_abbr = data.get("currentTeamAbbrev")
-    
-    headshot_data = await fetch_image(headshot_url)
-    logo = await get_team_logo(team_abbr)
-    
+
     # Simple border
     draw.rectangle([10, 10, width-10, height-10], outline=(50, 50, 50), width=5)
+
+    # Stats Section
+    stats_y = PLAYER_CARD_STATS_Y
+    draw.line([30, stats_y - 10, width-30, stats_y - 10], fill=(100, 100, 100), width=2)
+    if variant == "no_stats":
+        draw.text((width//2, stats_y + 50), "No stats available for current season", font=get_font(25), fill=(150, 150, 150), anchor="mm")
+    else:
+        header_font = get_font(20)
+        for label, _, x in stat_columns(variant == "goalie"):
+            draw.text((x, stats_y + 20), label, font=header_font, fill=(150, 150, 150), anchor="mm")
+    return card
+
+def render_player_card(data, headshot, logo):
+    width, height = PLAYER_CARD_SIZE
+    pos = data.get("position", "")
+    featured_stats = data.get("featuredStats", {}).get("regularSeason", {}).get("subSeason", {})
+    is_goalie = pos == "G"
+    if not featured_stats:
+        variant = "no_stats"
+    else:
+        variant = "goalie" if is_goalie else "skater"
+
+    card = player_card_template(variant).copy()
+    draw = ImageDraw.Draw(card)
     
-    if headshot_data:
-        headshot = Image.open(io.BytesIO(headshot_data)).convert("RGBA")
-        # Resize headshot, then leave room beneath for profile details.
-        headshot = headshot.resize((320, 320))
+    if headshot:
+        # Headshot is stored at 320x320, leaving room beneath for profile details.
         # Center headshot
         card.paste(headshot, (90, 120), headshot)
         
     # Add Logo (top right)
     if logo:
-        logo_resized = logo.resize((100, 100), Image.LANCZOS)
-        card.paste(logo_resized, (width - 120, 20), logo_resized)
+        card.paste(logo, (width - 120, 20), logo)
         
     # Player Info
     name_font = get_font(40)
@@ -131,7 +493,6 @@ async def generate_player_card(data):
     first_name = data.get("firstName", {}).get("default", "")
     last_name = data.get("lastName", {}).get("default", "").upper()
     number = data.get("sweaterNumber", "")
-    pos = data.get("position", "")
     team_name = data.get("fullTeamName", {}).get("default", "")
     shoots_catches = data.get("shootsCatches")
     height_inches = data.get("heightInInches")
@@ -151,77 +512,35 @@ async def generate_player_card(data):
     if isinstance(weight_pounds, int):
         profile_parts.append(f"WT: {weight_pounds} lb")
     if shoots_catches:
-        handed_label = "Catches" if pos == "G" else "Shoots"
+        handed_label = "Catches" if is_goalie else "Shoots"
         profile_parts.append(f"{handed_label}: {shoots_catches}")
     if profile_parts:
         draw.text((30, 450), " | ".join(profile_parts), font=details_font, fill=(180, 180, 180))
 
-    # Stats Section
-    stats_y = 500
-    draw.line([30, stats_y - 10, width-30, stats_y - 10], fill=(100, 100, 100), width=2)
-    
-    featured_stats = data.get("featuredStats", {}).get("regularSeason", {}).get("subSeason", {})
-    if not featured_stats:
-        draw.text((width//2, stats_y + 50), "No stats available for current season", font=info_font, fill=(150, 150, 150), anchor="mm")
-    else:
-        is_goalie = pos == "G"
-        if is_goalie:
-            stats = [
-                ("GP", featured_stats.get("gamesPlayed", 0)),
-                ("W", featured_stats.get("wins", 0)),
-                ("L", featured_stats.get("losses", 0)),
-                ("OTL", featured_stats.get("otLosses", 0)),
-                ("GAA", f"{featured_stats.get('goalsAgainstAvg', 0.0):.2f}"),
-                ("SV%", f"{featured_stats.get('savePctg', 0.0):.3f}")
-            ]
-        else:
-            stats = [
-                ("GP", featured_stats.get("gamesPlayed", 0)),
-                ("G", featured_stats.get("goals", 0)),
-                ("A", featured_stats.get("assists", 0)),
-                ("P", featured_stats.get("points", 0)),
-                ("+/-", featured_stats.get("plusMinus", 0)),
-                ("SOG", featured_stats.get("shots", 0))
-            ]
-            
-        # Draw stats headers and values
-        if is_goalie:
-            # Weighted widths for goalies: 4 narrow, 2 wide (GAA, SV%)
-            # 60*4 + 100*2 = 440
-            stat_widths = [60, 60, 60, 60, 100, 100]
-        else:
-            stat_width = (width - 60) // len(stats)
-            stat_widths = [stat_width] * len(stats)
-            
-        header_font = get_font(20)
+    # Stat values under the template's headers
+    if featured_stats:
         value_font = get_font(35)
-        
-        x_offset = 30
-        for i, (label, value) in enumerate(stats):
-            w = stat_widths[i]
-            x = x_offset + w // 2
-            draw.text((x, stats_y + 20), label, font=header_font, fill=(150, 150, 150), anchor="mm")
+        stats_y = PLAYER_CARD_STATS_Y
+        for _, key, x in stat_columns(is_goalie):
+            fmt = STAT_FORMATS.get(key)
+            value = fmt.format(featured_stats.get(key, 0.0)) if fmt else featured_stats.get(key, 0)
             draw.text((x, stats_y + 60), str(value), font=value_font, fill=(255, 255, 255), anchor="mm")
-            x_offset += w
 
     # Footer
     footer_font = get_font(15)
     season = data.get("featuredStats", {}).get("season", "N/A")
     draw.text((width//2, height - 30), f"NHL Stats Season {season}", font=footer_font, fill=(100, 100, 100), anchor="mm")
 
-    # Save to buffer
-    buffer = io.BytesIO()
-    card.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    return card
 
-async def draw_team_row(draw, img, team, x, y, team_font, points_font):
+def draw_team_row(draw, img, team, x, y, team_font, points_font, atlas):
+    # img must be RGBA: the logo is composited straight out of the atlas sheet
+    sheet, offsets = atlas
     abbr = team["teamAbbrev"]["default"]
-    logo = await get_team_logo(abbr)
-    if logo:
-        # Resize logo to fit row
-        logo_small = logo.resize((32, 32), Image.LANCZOS)
-        img.paste(logo_small, (x, y), logo_small)
+    offset = offsets.get(abbr)
+    if offset:
+        ox, oy = offset
+        img.alpha_composite(sheet, (x, y), (ox, oy, ox + LOGO_ROW_SIZE, oy + LOGO_ROW_SIZE))
     
     name = team["teamName"]["default"]
     points = team["points"]
@@ -234,20 +553,84 @@ async def draw_team_row(draw, img, team, x, y, team_font, points_font):
     stats_text = f"{gp} GP | {record} | {points} PTS"
     draw.text((x + 500, y + 16), stats_text, font=points_font, fill=(200, 200, 200), anchor="rm")
 
+def _standings_abbrs(standings):
+    return [t["teamAbbrev"]["default"] for t in standings]
+
+STANDINGS_FIELDS = ("conferenceAbbrev", "divisionName", "divisionSequence", "wildcardSequence",
+                    "conferenceSequence", "points", "gamesPlayed", "wins", "losses", "otLosses")
+
+def standings_fingerprint(standings):
+    return [
+        [t["teamAbbrev"]["default"], t["teamName"]["default"]] + [t.get(f) for f in STANDINGS_FIELDS]
+        for t in standings
+    ]
+
 async def generate_standings_image(data):
-    width, height = 1200, 650
+    standings = data.get("standings", [])
+    if not standings:
+        return None
+    async def build():
+        abbrs = _standings_abbrs(standings)
+        atlas = await get_logo_atlas(abbrs)
+        return await run_render(render_standings_image, data, atlas), all(a.upper() in atlas[1] for a in abbrs)
+    return await cached_render("standings", standings_fingerprint(standings), build)
+
+STANDINGS_SIZE = (1200, 650)
+# Balanced margins: Left 66, Middle 68, Right 66
+# (conference abbr, column x, title, title color)
+STANDINGS_COLUMNS = (
+    ("E", 66, "EASTERN CONFERENCE", (0, 150, 255)),
+    ("W", 634, "WESTERN CONFERENCE", (255, 50, 50)),
+)
+
+def playoff_column_layout(division_sizes, wildcard_count):
+    """
+    Section headers and team row positions for one conference column.
+    division_sizes: ((division name, team count), ...)
+    Returns ([(header text, y)], [row y]) top to bottom.
+    """
+    y = 155
+    headers = []
+    rows = []
+    for div_name, count in division_sizes:
+        headers.append((div_name.upper(), y))
+        y += 30
+        for _ in range(count):
+            rows.append(y)
+            y += 40
+        y += 15
+
+    headers.append(("WILD CARD", y))
+    y += 30
+    for _ in range(wildcard_count):
+        rows.append(y)
+        y += 40
+    return headers, rows
+
+@lru_cache(maxsize=8)
+def standings_template(layout):
+    # layout: one (division_sizes, wildcard count) per STANDINGS_COLUMNS entry
+    width, height = STANDINGS_SIZE
     img = Image.new('RGB', (width, height), color=(20, 20, 20))
     draw = ImageDraw.Draw(img)
     
     # Draw Border
     draw.rectangle([10, 10, width-10, height-10], outline=(50, 50, 50), width=5)
-    
-    standings = data.get("standings", [])
-    if not standings:
-        return None
 
     # Title
     draw.text((width//2, 45), "NHL PLAYOFF PICTURE", font=get_font(40), fill=(255, 255, 255), anchor="mm")
+
+    conf_font = get_font(30)
+    div_header_font = get_font(22)
+    for (_, x, title, color), (division_sizes, wildcard_count) in zip(STANDINGS_COLUMNS, layout):
+        draw.text((x + 250, 105), title, font=conf_font, fill=color, anchor="mm")
+        headers, _ = playoff_column_layout(division_sizes, wildcard_count)
+        for text, y in headers:
+            draw.text((x, y), text, font=div_header_font, fill=(150, 150, 150))
+    return img
+
+def render_standings_image(data, atlas):
+    standings = data.get("standings", [])
     
     def get_conf_data(conf_abbr):
         conf_teams = [s for s in standings if s["conferenceAbbrev"] == conf_abbr]
@@ -263,73 +646,53 @@ async def generate_standings_image(data):
                            key=lambda x: x["wildcardSequence"])
         return div_leaders, wildcards
 
-    east_divs, east_wc = get_conf_data("E")
-    west_divs, west_wc = get_conf_data("W")
+    conferences = [get_conf_data(conf_abbr) for conf_abbr, *_ in STANDINGS_COLUMNS]
+    layout = tuple(
+        (tuple((div_name, len(teams)) for div_name, teams in divs), len(wildcards))
+        for divs, wildcards in conferences
+    )
+    # RGBA while rows are composited from the logo atlas
+    img = standings_template(layout).convert('RGBA')
+    draw = ImageDraw.Draw(img)
 
     # Fonts
-    conf_font = get_font(30)
-    div_header_font = get_font(22)
     team_font = get_font(18)
     points_font = get_font(18)
 
-    # Render Eastern Conference (Left)
-    # Balanced margins: Left 66, Middle 68, Right 66
-    ex = 66
-    ey = 105
-    draw.text((ex + 250, ey), "EASTERN CONFERENCE", font=conf_font, fill=(0, 150, 255), anchor="mm")
-    ey += 50
-    
-    for div_name, teams in east_divs:
-        draw.text((ex, ey), div_name.upper(), font=div_header_font, fill=(150, 150, 150))
-        ey += 30
-        for t in teams:
-            await draw_team_row(draw, img, t, ex, ey, team_font, points_font)
-            ey += 40
-        ey += 15
-    
-    draw.text((ex, ey), "WILD CARD", font=div_header_font, fill=(150, 150, 150))
-    ey += 30
-    for t in east_wc:
-        await draw_team_row(draw, img, t, ex, ey, team_font, points_font)
-        ey += 40
-
-    # Render Western Conference (Right)
-    wx = 634
-    wy = 105
-    draw.text((wx + 250, wy), "WESTERN CONFERENCE", font=conf_font, fill=(255, 50, 50), anchor="mm")
-    wy += 50
-    
-    for div_name, teams in west_divs:
-        draw.text((wx, wy), div_name.upper(), font=div_header_font, fill=(150, 150, 150))
-        wy += 30
-        for t in teams:
-            await draw_team_row(draw, img, t, wx, wy, team_font, points_font)
-            wy += 40
-        wy += 15
-        
-    draw.text((wx, wy), "WILD CARD", font=div_header_font, fill=(150, 150, 150))
-    wy += 30
-    for t in west_wc:
-        await draw_team_row(draw, img, t, wx, wy, team_font, points_font)
-        wy += 40
+    for (_, x, _, _), (division_sizes, wildcard_count), (divs, wildcards) in zip(STANDINGS_COLUMNS, layout, conferences):
+        _, rows = playoff_column_layout(division_sizes, wildcard_count)
+        teams = [t for _, div_teams in divs for t in div_teams] + wildcards
+        for t, y in zip(teams, rows):
+            draw_team_row(draw, img, t, x, y, team_font, points_font, atlas)
 
-    # Save to buffer
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    return img.convert('RGB')
 
 async def generate_conference_image(data):
     standings = data.get("standings", [])
     if not standings:
         return None
-        
-    # Full League, Side by Side
-    east = sorted([s for s in standings if s["conferenceAbbrev"] == "E"], key=lambda x: x["conferenceSequence"])
-    west = sorted([s for s in standings if s["conferenceAbbrev"] == "W"], key=lambda x: x["conferenceSequence"])
-    title = "NHL STANDINGS"
-    width = 1200
-    height = 100 + max(len(east), len(west)) * 45 + 50
+    async def build():
+        abbrs = _standings_abbrs(standings)
+        atlas = await get_logo_atlas(abbrs)
+        return await run_render(render_conference_image, data, atlas), all(a.upper() in atlas[1] for a in abbrs)
+    return await cached_render("conference", standings_fingerprint(standings), build)
+
+CONFERENCE_WIDTH = 1200
+CONFERENCE_ROW_HEIGHT = 45
+# Balanced margins for two columns
+# Left: 33, Middle: 34, Right: 33
+# (conference abbr, rank x, row x, header x, header, header color)
+CONFERENCE_COLUMNS = (
+    ("E", 73, 83, 333, "EASTERN", (0, 150, 255)),
+    ("W", 657, 667, 917, "WESTERN", (255, 50, 50)),
+)
+
+@lru_cache(maxsize=8)
+def conference_template(row_counts):
+    # The height follows the longer conference, so this is cached per row counts
+    # (which also fix the rank numbers) rather than once per image type.
+    width = CONFERENCE_WIDTH
+    height = 100 + max(row_counts) * CONFERENCE_ROW_HEIGHT + 50
         
     img = Image.new('RGB', (width, height), color=(20, 20, 20))
     draw = ImageDraw.Draw(img)
@@ -337,51 +700,70 @@ async def generate_conference_image(data):
     # Draw Border
     draw.rectangle([10, 10, width-10, height-10], outline=(50, 50, 50), width=5)
     
-    draw.text((width//2, 45), title, font=get_font(35), fill=(255, 255, 255), anchor="mm")
-    
-    team_font = get_font(18)
-    points_font = get_font(18)
+    draw.text((width//2, 45), "NHL STANDINGS", font=get_font(35), fill=(255, 255, 255), anchor="mm")
     
     # Vertical Separator
     draw.line([width//2, 80, width//2, height - 30], fill=(50, 50, 50), width=2)
 
-    # Balanced margins for two columns
-    # Left: 33, Middle: 34, Right: 33
-    # East Index: 73, East Row: 83
-    # West Index: 657, West Row: 667
+    team_font = get_font(18)
+    for (_, rank_x, _, header_x, header, color), count in zip(CONFERENCE_COLUMNS, row_counts):
+        draw.text((header_x, 75), header, font=get_font(25), fill=color, anchor="mm")
+        for i in range(count):
+            y = 105 + i * CONFERENCE_ROW_HEIGHT
+            draw.text((rank_x, y + 16), f"{i+1}.", font=team_font, fill=(150, 150, 150), anchor="rm")
+    return img
+
+def render_conference_image(data, atlas):
+    standings = data.get("standings", [])
+        
+    # Full League, Side by Side
+    columns = [
+        sorted([s for s in standings if s["conferenceAbbrev"] == conf_abbr], key=lambda x: x["conferenceSequence"])
+        for conf_abbr, *_ in CONFERENCE_COLUMNS
+    ]
+    # RGBA while rows are composited from the logo atlas
+    img = conference_template(tuple(len(teams) for teams in columns)).convert('RGBA')
+    draw = ImageDraw.Draw(img)
     
-    # East
-    curr_y = 105
-    draw.text((333, curr_y - 30), "EASTERN", font=get_font(25), fill=(0, 150, 255), anchor="mm")
-    for i, t in enumerate(east):
-        draw.text((73, curr_y + 16), f"{i+1}.", font=team_font, fill=(150, 150, 150), anchor="rm")
-        await draw_team_row(draw, img, t, 83, curr_y, team_font, points_font)
-        curr_y += 45
+    team_font = get_font(18)
+    points_font = get_font(18)
     
-    # West
-    curr_y = 105
-    draw.text((917, curr_y - 30), "WESTERN", font=get_font(25), fill=(255, 50, 50), anchor="mm")
-    for i, t in enumerate(west):
-        draw.text((657, curr_y + 16), f"{i+1}.", font=team_font, fill=(150, 150, 150), anchor="rm")
-        await draw_team_row(draw, img, t, 667, curr_y, team_font, points_font)
-        curr_y += 45
+    for (_, _, row_x, _, _, _), teams in zip(CONFERENCE_COLUMNS, columns):
+        for i, t in enumerate(teams):
+            draw_team_row(draw, img, t, row_x, 105 + i * CONFERENCE_ROW_HEIGHT, team_font, points_font, atlas)
             
-    # Save to buffer
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    return img.convert('RGB')
 
 async def generate_next_games_image(games_data):
     # games_data: list of {team_name, team_abbr, opponent_abbr, is_home, time_str, broadcasts}
-    width, height = 900, 520
+    async def build():
+        abbrs = []
+        for data in games_data:
+            abbrs += [data['team_abbr'], data['opponent_abbr']]
+        logos = await get_team_logos(abbrs)
+        return await run_render(render_next_games_image, games_data, logos), all(a in logos for a in abbrs if a)
+    return await cached_render("next_games", games_data, build)
+
+NEXT_GAMES_SIZE = (900, 520)
+
+@lru_cache(maxsize=1)
+def next_games_template():
+    width, height = NEXT_GAMES_SIZE
     img = Image.new('RGB', (width, height), color=(20, 20, 20))
     draw = ImageDraw.Draw(img)
-    
+
     # Border + Title
     draw.rectangle([10, 10, width-10, height-10], outline=(50, 50, 50), width=5)
     draw.text((width//2, 50), "UPCOMING GAMES", font=get_font(40), fill=(255, 255, 255), anchor="mm")
-    
+    return img
+
+def render_next_games_image(games_data, logos):
+    # Everything below the title moves with the data (time and playoff lines
+    # push "WATCH ON" down), so only the border and title come from the template
+    width, height = NEXT_GAMES_SIZE
+    img = next_games_template().copy()
+    draw = ImageDraw.Draw(img)
+
     # Fonts
     team_name_font = get_font(28)
     vs_font = get_font(24)
@@ -402,21 +784,19 @@ async def generate_next_games_image(games_data):
         y_offset += 80
         
         # Logos
-        our_logo = await get_team_logo(data['team_abbr'])
-        opp_logo = await get_team_logo(data['opponent_abbr'])
+        our_logo = logos.get(data['team_abbr'])
+        opp_logo = logos.get(data['opponent_abbr'])
         
-        logo_size = 100
+        logo_size = LOGO_LARGE_SIZE
         
         if our_logo:
-            our_logo_res = our_logo.resize((logo_size, logo_size), Image.LANCZOS)
-            img.paste(our_logo_res, (x_center - logo_size - 30, y_offset - logo_size // 2), our_logo_res)
+            img.paste(our_logo, (x_center - logo_size - 30, y_offset - logo_size // 2), our_logo)
             
         vs_text = "VS" if data['is_home'] else "@"
         draw.text((x_center, y_offset), vs_text, font=vs_font, fill=(150, 150, 150), anchor="mm")
         
         if opp_logo:
-            opp_logo_res = opp_logo.resize((logo_size, logo_size), Image.LANCZOS)
-            img.paste(opp_logo_res, (x_center + 30, y_offset - logo_size // 2), opp_logo_res)
+            img.paste(opp_logo, (x_center + 30, y_offset - logo_size // 2), opp_logo)
             
         y_offset += 90
         
@@ -451,39 +831,70 @@ async def generate_next_games_image(games_data):
             
             # Wrap broadcast text
             max_broadcast_width = col_width - 20
-            broadcast_lines = wrap_text(data['broadcasts'], broadcast_font, max_broadcast_width)
+            broadcast_lines = wrap_text(data['broadcasts'], 18, max_broadcast_width)
             
             for line in broadcast_lines:
                 draw.text((x_center, y_offset), line, font=broadcast_font, fill=(0, 180, 255), anchor="mm")
                 y_offset += 22
 
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    return img
+
+def _flag_url(alpha2):
+    return f"https://flagcdn.com/w160/{alpha2.lower()}.png"
 
 async def generate_olympic_schedule_image(games_data, target_date):
     # games_data: list of {league, date, time_utc, home, away, round}
     # home/away: {name, abbreviation, alpha2}
-    
-    width = 900
-    row_height = 80
-    header_height = 120
-    footer_height = 40
-    num_rows = len(games_data) if games_data else 1
-    height = header_height + (num_rows * row_height) + footer_height
-    
+    async def build():
+        alpha2s = []
+        for game in games_data:
+            if game.get("no_games"):
+                continue
+            for side in ("home", "away"):
+                alpha2 = game[side].get("alpha2")
+                if alpha2 and alpha2 not in alpha2s:
+                    alpha2s.append(alpha2)
+        flag_variants = await asyncio.gather(*(load_image_variants(_flag_url(a), [FLAG_SIZE]) for a in alpha2s))
+        flags = {a: v[FLAG_SIZE] for a, v in zip(alpha2s, flag_variants) if v}
+        return await run_render(render_olympic_schedule_image, games_data, target_date, flags), len(flags) == len(alpha2s)
+    return await cached_render("olympic_schedule", [games_data, target_date], build)
+
+OLYMPIC_WIDTH = 900
+OLYMPIC_ROW_HEIGHT = 80
+OLYMPIC_HEADER_HEIGHT = 120
+OLYMPIC_FOOTER_HEIGHT = 40
+
+@lru_cache(maxsize=8)
+def olympic_schedule_template(num_rows, date_str):
+    # Height depends on the number of rows, so this is cached per row count and date
+    width = OLYMPIC_WIDTH
+    height = OLYMPIC_HEADER_HEIGHT + (num_rows * OLYMPIC_ROW_HEIGHT) + OLYMPIC_FOOTER_HEIGHT
+
     img = Image.new('RGB', (width, height), color=(20, 20, 20))
     draw = ImageDraw.Draw(img)
 
     # Border
     draw.rectangle([10, 10, width-10, height-10], outline=(50, 50, 50), width=5)
-    
+
     # Title
-    date_str = target_date.strftime("%A, %b %d, %Y").upper()
     draw.text((width//2, 45), "OLYMPIC HOCKEY SCHEDULE", font=get_font(30), fill=(255, 255, 255), anchor="mm")
     draw.text((width//2, 85), date_str, font=get_font(20), fill=(150, 150, 150), anchor="mm")
-    
+
+    # Separators between rows
+    for i in range(1, num_rows):
+        y = OLYMPIC_HEADER_HEIGHT + i * OLYMPIC_ROW_HEIGHT
+        draw.line([30, y, width-30, y], fill=(40, 40, 40), width=1)
+    return img
+
+def render_olympic_schedule_image(games_data, target_date, flags):
+    width = OLYMPIC_WIDTH
+    row_height = OLYMPIC_ROW_HEIGHT
+    header_height = OLYMPIC_HEADER_HEIGHT
+    num_rows = len(games_data) if games_data else 1
+
+    img = olympic_schedule_template(num_rows, target_date.strftime("%A, %b %d, %Y").upper()).copy()
+    draw = ImageDraw.Draw(img)
+
     if not games_data:
         draw.text((width//2, header_height + row_height // 2), "No games scheduled for the next two days", 
                   font=get_font(24), fill=(150, 150, 150), anchor="mm")
@@ -495,8 +906,6 @@ async def generate_olympic_schedule_image(games_data, target_date):
                 draw.text((width//2, curr_y + row_height // 2), f"No games scheduled for {date_str}", 
                           font=get_font(20), fill=(150, 150, 150), anchor="mm")
                 curr_y += row_height
-                if game != games_data[-1]:
-                    draw.line([30, curr_y, width-30, curr_y], fill=(40, 40, 40), width=1)
                 continue
 
             y_mid = curr_y + row_height // 2
@@ -518,59 +927,40 @@ async def generate_olympic_schedule_image(games_data, target_date):
             # Teams and Flags
             away = game['away']
             home = game['home']
-            await draw_olympic_team(draw, img, away, 430, y_mid, "rm")
+            draw_olympic_team(draw, img, away, 430, y_mid, "rm", flags)
             draw.text((450, y_mid), "VS", font=get_font(20), fill=(100, 100, 100), anchor="mm")
-            await draw_olympic_team(draw, img, home, 470, y_mid, "lm")
+            draw_olympic_team(draw, img, home, 470, y_mid, "lm", flags)
             
             curr_y += row_height
-            if game != games_data[-1]:
-                draw.line([30, curr_y, width-30, curr_y], fill=(40, 40, 40), width=1)
 
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    return img
 
-async def draw_olympic_team(draw, img, team, x, y, anchor):
+def draw_olympic_team(draw, img, team, x, y, anchor, flags):
     name = team.get('name', 'TBD')
     abbr = team.get('abbreviation', 'TBD')
     alpha2 = team.get('alpha2')
     
-    # Try to get flag
-    flag_img = None
-    if alpha2:
-        flag_url = f"https://flagcdn.com/w160/{alpha2.lower()}.png"
-        flag_data = await fetch_image(flag_url)
-        if flag_data:
-            try:
-                flag_img = Image.open(io.BytesIO(flag_data)).convert("RGBA")
-            except:
-                pass
+    # Flags are pre-sized by the asset store
+    flag_img = flags.get(alpha2) if alpha2 else None
     
     font = get_font(20)
     spacing = 10
-    flag_w, flag_h = 40, 24
+    flag_w, flag_h = FLAG_SIZE
 
     # Simple truncation if too long to avoid center crowding
     max_text_width = 240
-    bbox = draw.textbbox((0, 0), name, font=font)
-    if (bbox[2] - bbox[0]) > max_text_width:
-        while (bbox[2] - bbox[0]) > max_text_width - 15:
-            name = name[:-1]
-            bbox = draw.textbbox((0, 0), name + "…", font=font)
-        name += "…"
+    if text_width(name, 20) > max_text_width:
+        name = truncate_text(name, 20, max_text_width - 15)
 
     if anchor == "rm":
         # Text block (right-aligned) then Flag to the far right
         text_right = x - (flag_w + spacing if flag_img else 0)
         draw.text((text_right, y), name, font=font, fill=(255, 255, 255), anchor="rm")
         if flag_img:
-            flag_resized = flag_img.resize((flag_w, flag_h), Image.LANCZOS)
-            img.paste(flag_resized, (x - flag_w, y - flag_h // 2), flag_resized)
+            img.paste(flag_img, (x - flag_w, y - flag_h // 2), flag_img)
     else:
         # Flag then Text block (left-aligned)
         text_left = x + (flag_w + spacing if flag_img else 0)
         if flag_img:
-            flag_resized = flag_img.resize((flag_w, flag_h), Image.LANCZOS)
-            img.paste(flag_resized, (x, y - flag_h // 2), flag_resized)
+            img.paste(flag_img, (x, y - flag_h // 2), flag_img)
         draw.text((text_left, y), name, font=font, fill=(255, 255, 255), anchor="lm")
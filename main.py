@@ -1,13 +1,24 @@
+import io
 import os
+import copy
+import time
+import asyncio
 import discord
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from discord.ext import commands
 from dotenv import load_dotenv
-from nhl_api import fetch_next_game, search_player, get_player_details, get_standings, get_next_game_info, format_game_info, is_on_espn_plus, get_espn_scoreboard, get_olympic_schedule
-from image_generator import generate_player_card, generate_standings_image, generate_conference_image, generate_next_games_image, generate_olympic_schedule_image
 
+# Settings are read when the project modules are imported, so .env has to be loaded first
 load_dotenv()
+
+from nhl_api import fetch_next_game, search_player, get_player_details, get_standings, get_next_game_info, is_on_espn_plus, get_espn_scoreboard_index, get_olympic_schedules, roster_refresh_loop, roster_ready
+from image_generator import generate_player_card, generate_standings_image, generate_conference_image, generate_next_games_image, generate_olympic_schedule_image, shutdown_render_executor, prefetch_team_logos, logo_cache_footprint, render_fingerprint, render_cached, standings_fingerprint, image_extension, image_format_for, IMAGE_FORMAT
+from http_client import close_session, breaker_states
+from player_index import fold_name, tokenize
+import metrics
+import profiling
+
 TOKEN = os.getenv('DISCORD_TOKEN')
 
 TEAMS = {
@@ -16,122 +27,216 @@ TEAMS = {
     "Dallas Stars": "DAL"
 }
 
+# Hot command outputs are rendered ahead of time by prerender_loop and served
+# as-is while they are no older than two passes of their job.
+PRERENDER_INTERVAL = int(os.getenv("PRERENDER_INTERVAL") or "120")
+# key -> {"data": encoded image, "fingerprint": render fingerprint, "checked": datetime, "max_age": seconds}
+PRERENDERED = {}
+# The Olympic crawl costs dozens of ESPN core API requests, so it runs on its own
+# longer interval and backs off to OLYMPIC_IDLE_INTERVAL while neither day has any
+# games (i.e. outside the tournaments). A new ET day always triggers a crawl.
+OLYMPIC_PRERENDER_INTERVAL = int(os.getenv("OLYMPIC_PRERENDER_INTERVAL") or "900")
+OLYMPIC_IDLE_INTERVAL = int(os.getenv("OLYMPIC_IDLE_INTERVAL") or "21600")
+OLYMPIC_CRAWL = {"date": None, "next_crawl": 0.0}
+
+class NHLBot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.background_tasks = []
+
+    async def close(self):
+        for task in self.background_tasks:
+            task.cancel()
+        # Release the shared upstream HTTP client and render pool along with the bot
+        await metrics.stop_metrics_server()
+        await close_session()
+        shutdown_render_executor()
+        await super().close()
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+bot = NHLBot(command_prefix='!', intents=intents)
 
 @bot.event
 async def on_ready():
     print(f'{bot.user.name} has connected to Discord!')
 
+    # on_ready fires again after reconnects, so only start background work once
+    if not bot.background_tasks:
+        bot.background_tasks.append(asyncio.create_task(roster_refresh_loop()))
+        bot.background_tasks.append(asyncio.create_task(prerender_loop()))
+        try:
+            if await metrics.start_metrics_server():
+                print(f'Metrics on http://{metrics.METRICS_HOST}:{metrics.METRICS_PORT}/metrics')
+        except OSError as e:
+            print(f"Metrics endpoint unavailable: {e}")
+
+    # Warm the logo store for every team so the first standings render doesn't download them
+    data = await get_standings()
+    if data:
+        team_abbrs = [s["teamAbbrev"]["default"] for s in data.get("standings", [])]
+        loaded = await prefetch_team_logos(team_abbrs)
+        print(f'Prefetched {loaded} team logos ({logo_cache_footprint() / 1024:.0f} KiB)')
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+    # Hooks run in the command's own context, so every span recorded while it runs lands in this tree
+    command = ctx.command.qualified_name
+    if getattr(ctx, "profile_requested", False) or profiling.enabled_for(command):
+        ctx.profile = profiling.start(command, invocation=ctx.message.content)
+
+@bot.after_invoke
+async def record_command(ctx):
+    # Runs after failed commands too; ctx.command_failed tells them apart
+    command = ctx.command.qualified_name
+    metrics.COMMAND_SECONDS.observe(time.perf_counter() - ctx.started_at, command=command)
+    metrics.COMMANDS_TOTAL.inc(command=command, status="error" if ctx.command_failed else "ok")
+
+    profile = getattr(ctx, "profile", None)
+    if profile:
+        root = profiling.finish(profile)
+        root.set(failed=ctx.command_failed)
+        ctx.profile_root = root
+        ctx.profile_paths = profiling.dump(root)
+        print(f"Profiled !{command} in {root.duration * 1000:.0f}ms: {ctx.profile_paths[0]}")
+
+def get_prerendered(key):
+    entry = PRERENDERED.get(key)
+    if entry and (datetime.now(timezone.utc) - entry["checked"]).total_seconds() <= entry["max_age"]:
+        profiling.add_span(f"prerendered {key}", time.perf_counter(), 0)
+        return io.BytesIO(entry["data"])
+    return None
+
+async def prerender(key, fingerprint, build, max_age=PRERENDER_INTERVAL * 2):
+    # Only re-render when the upstream data behind the image changed
+    entry = PRERENDERED.get(key)
+    if entry and entry["fingerprint"] == fingerprint:
+        entry["checked"] = datetime.now(timezone.utc)
+        entry["max_age"] = max_age
+        return
+    buffer = await build()
+    if buffer:
+        # An image drawn without one of its assets is still served, but the
+        # fingerprint is withheld so the next pass renders it again
+        PRERENDERED[key] = {"data": buffer.getvalue(), "fingerprint": fingerprint if render_cached(fingerprint) else None, "checked": datetime.now(timezone.utc), "max_age": max_age}
+
+async def prerender_standings():
+    data = await get_standings()
+    if not data or not data.get("standings"):
+        return
+    payload = standings_fingerprint(data["standings"])
+    await prerender("standings", render_fingerprint("standings", payload), lambda: generate_standings_image(data))
+    await prerender("conference", render_fingerprint("conference", payload), lambda: generate_conference_image(data))
+
+async def prerender_next_games():
+    games_data = await build_next_games_data()
+    if games_data:
+        await prerender("next_games", render_fingerprint("next_games", games_data), lambda: generate_next_games_image(games_data))
+
+async def prerender_olympics():
+    today_et = datetime.now(ZoneInfo("America/New_York")).date()
+    if OLYMPIC_CRAWL["date"] == today_et and time.monotonic() < OLYMPIC_CRAWL["next_crawl"]:
+        return
+    all_games, today_et = await build_olympic_games()
+    has_games = any(not g.get("no_games") for g in all_games)
+    interval = OLYMPIC_PRERENDER_INTERVAL if has_games else OLYMPIC_IDLE_INTERVAL
+    OLYMPIC_CRAWL.update(date=today_et, next_crawl=time.monotonic() + interval)
+    fingerprint = render_fingerprint("olympic_schedule", [all_games, today_et])
+    await prerender("olympic_schedule", fingerprint, lambda: generate_olympic_schedule_image(all_games, today_et), max_age=interval * 2)
+
+async def prerender_loop():
+    while True:
+        for job in (prerender_standings, prerender_next_games, prerender_olympics):
+            try:
+                await job()
+            except Exception as e:
+                print(f"Pre-render {job.__name__} failed: {e}")
+        await asyncio.sleep(PRERENDER_INTERVAL)
+
+async def build_olympic_games():
+    # Determine "today" and "tomorrow" based on America/New_York timezone
+    now_et = datetime.now(ZoneInfo("America/New_York"))
+    today_et = now_et.date()
+    tomorrow_et = today_et + timedelta(days=1)
+
+    all_games = []
+    with profiling.span("olympic_crawl"):
+        schedules = await get_olympic_schedules([today_et, tomorrow_et])
+    for date, games in schedules.items():
+        if not games:
+            all_games.append({"no_games": True, "date": date})
+        else:
+            all_games.extend(games)
+    return all_games, today_et
+
+async def build_next_games_data():
+    """
+    Resolves the next game for every tracked team into the rows
+    generate_next_games_image draws. Returns an empty list if none are found.
+    """
+    # Resolve every team concurrently. The ESPN scoreboard index for the coming week is
+    # loaded speculatively alongside them since that covers nearly every next game.
+    today_et = datetime.now(ZoneInfo("America/New_York")).date()
+    week = [(today_et + timedelta(days=i)).strftime("%Y%m%d") for i in range(7)]
+    scoreboard_task = asyncio.create_task(get_espn_scoreboard_index(week))
+
+    with profiling.span("next_game_info"):
+        results = await asyncio.gather(*(get_next_game_info(team_abbr) for team_abbr in TEAMS.values()))
+
+    team_games = {}
+    for (team_name, team_abbr), game in zip(TEAMS.items(), results):
+        if game:
+            team_games[team_abbr] = (team_name, game)
+
+    if not team_games:
+        scoreboard_task.cancel()
+        return []
+
+    # Dates already covered by the speculative load come straight from the index cache
+    with profiling.span("scoreboard_index"):
+        await scoreboard_task
+        scoreboard_index = await get_espn_scoreboard_index([g.date_key for _, g in team_games.values() if g.date_key])
+
+    games_data = []
+    for team_abbr, (team_name, game) in team_games.items():
+        if game.is_tbd:
+            # Handle TBD games (usually between playoff rounds)
+            broadcast_str = None
+        else:
+            relevant_networks = list(game.broadcasts)
+            if is_on_espn_plus(game, scoreboard_index) and "ESPN+" not in relevant_networks:
+                relevant_networks.append("ESPN+")
+            broadcast_str = ", ".join(relevant_networks) if relevant_networks else None
+
+        games_data.append({
+            "team_name": team_name,
+            "team_abbr": team_abbr,
+            "opponent_abbr": game.opponent_abbr,
+            "is_home": game.is_home,
+            "time_str": game.time_label(),
+            "broadcasts": broadcast_str,
+            "playoff_info": "\n".join(game.playoff_lines()) or None
+        })
+
+    return games_data
+
 @bot.command(name='nextgames', aliases=['next'], help='Shows the next game for the Sabres, Kraken, and Stars.')
 async def next_games(ctx):
     async with ctx.typing():
-        # First, fetch game info for all teams to identify dates
-        team_games = {}
-        all_dates = []
-        for team_name, team_abbr in TEAMS.items():
-            game = await get_next_game_info(team_abbr)
-            if game:
-                team_games[team_abbr] = (team_name, game)
-                all_dates.append(game["gameDate"].replace("-", ""))
-        
-        if not team_games:
-            await ctx.send("No upcoming games found for the tracked teams.")
+        image_buffer = get_prerendered("next_games")
+        if image_buffer:
+            await ctx.send(file=discord.File(fp=image_buffer, filename=f"next_games.{image_extension()}"))
             return
 
-        # Fetch ESPN scoreboard for the relevant date range
-        scoreboard_data = None
-        if all_dates:
-            min_date = min(all_dates)
-            max_date = max(all_dates)
-            date_range = min_date if min_date == max_date else f"{min_date}-{max_date}"
-            scoreboard_data = await get_espn_scoreboard(date_range)
-
-        games_data = []
-        for team_abbr, (team_name, game) in team_games.items():
-            if game.get("isTBD"):
-                # Handle TBD games (usually between playoff rounds)
-                status = game.get("seriesStatus", {})
-                series_title = status.get("seriesTitle", "Playoffs")
-                top_wins = status.get("topSeedWins", 0)
-                bot_wins = status.get("bottomSeedWins", 0)
-                
-                top_abbr = game.get("topSeed", {}).get("abbrev")
-                bot_abbr = game.get("bottomSeed", {}).get("abbrev")
-                is_top = (team_abbr == top_abbr)
-                opponent_abbr = bot_abbr if is_top else top_abbr
-                if not opponent_abbr:
-                    opponent_abbr = "TBD"
-                
-                score_str = f"{top_wins}-{bot_wins}" if is_top else f"{bot_wins}-{top_wins}"
-                if top_wins == bot_wins:
-                    series_summary = f"Series Tied {top_wins}-{bot_wins}"
-                elif (is_top and top_wins > bot_wins) or (not is_top and bot_wins > top_wins):
-                    series_summary = f"Leading {score_str}"
-                else:
-                    series_summary = f"Trailing {score_str}"
-
-                games_data.append({
-                    "team_name": team_name,
-                    "team_abbr": team_abbr,
-                    "opponent_abbr": opponent_abbr,
-                    "is_home": False, # Doesn't matter for TBD
-                    "time_str": "Next Game TBD",
-                    "broadcasts": None,
-                    "playoff_info": f"{series_title}\n{series_summary}"
-                })
-                continue
-
-            home_abbr = game["homeTeam"]["abbrev"]
-            away_abbr = game["awayTeam"]["abbrev"]
-            is_home = (home_abbr == team_abbr)
-            opponent_abbr = away_abbr if is_home else home_abbr
-            
-            full_info = format_game_info(game)
-            # format_game_info returns "AWAY @ HOME Day @ Time [Playoff Info]"
-            # We want just "Day @ Time"
-            parts = full_info.split(" ")
-            time_only = " ".join(parts[3:])
-            
-            # If there's playoff info in brackets at the end, extract it
-            playoff_info = None
-            if "[" in time_only and "]" in time_only:
-                start = time_only.find("[")
-                playoff_info = time_only[start+1:-1].replace(" - ", "\n")
-                time_only = time_only[:start].strip()
-
-            broadcasts = game.get("tvBroadcasts", [])
-            relevant_networks = []
-            for b in broadcasts:
-                # Include National broadcasts or those matching our team's home/away status
-                if b.get("market") == "N" or (is_home and b.get("market") == "H") or (not is_home and b.get("market") == "A"):
-                    network = b.get("network")
-                    if network and network not in relevant_networks:
-                        relevant_networks.append(network)
-            
-            if is_on_espn_plus(game, scoreboard_data) and "ESPN+" not in relevant_networks:
-                relevant_networks.append("ESPN+")
-            
-            broadcast_str = ", ".join(relevant_networks) if relevant_networks else None
-
-            games_data.append({
-                "team_name": team_name,
-                "team_abbr": team_abbr,
-                "opponent_abbr": opponent_abbr,
-                "is_home": is_home,
-                "time_str": time_only,
-                "broadcasts": broadcast_str,
-                "playoff_info": playoff_info
-            })
-        
+        games_data = await build_next_games_data()
         if not games_data:
             await ctx.send("No upcoming games found for the tracked teams.")
             return
 
         try:
             image_buffer = await generate_next_games_image(games_data)
-            file = discord.File(fp=image_buffer, filename="next_games.png")
+            file = discord.File(fp=image_buffer, filename=f"next_games.{image_extension()}")
             await ctx.send(file=file)
         except Exception as e:
             await ctx.send(f"Error generating next games image: {str(e)}")
@@ -139,40 +244,38 @@ async def next_games(ctx):
 @bot.command(name='player', help='Shows a player card for a given player name.')
 async def player_card(ctx, *, name: str):
     async with ctx.typing():
-        matches = await search_player(name)
+        with profiling.span("search_player") as span:
+            matches = await search_player(name)
+            span.set(matches=len(matches))
         
         if not matches:
-            await ctx.send(f"No players found matching '{name}'.")
+            if not roster_ready():
+                await ctx.send("The player roster is still loading. Please try again in a moment.")
+            else:
+                await ctx.send(f"No players found matching '{name}'.")
             return
         
-        # Determine the best match
-        player = None
-        if len(matches) == 1:
-            player = matches[0]
-        else:
-            # Check for exact match
-            exact_match = next((p for p in matches if f"{p['firstName']} {p['lastName']}".lower() == name.lower()), None)
-            if exact_match:
-                player = exact_match
-            elif len(matches) > 10:
+        # Matches are ranked, so the first one is the best candidate
+        player = matches[0]
+        is_exact = player.folded_name == " ".join(tokenize(fold_name(name)))
+        if len(matches) > 1 and not is_exact:
+            if len(matches) > 10:
                 await ctx.send(f"Found {len(matches)} matches for '{name}'. Please be more specific.")
                 return
-            else:
-                # Pick the first one and mention other possibilities
-                player = matches[0]
-                others = ", ".join([f"{p['firstName']} {p['lastName']}" for p in matches[1:4]])
-                if len(matches) > 4:
-                    others += "..."
-                await ctx.send(f"Multiple matches found. Showing {player['firstName']} {player['lastName']}. (Others: {others})")
-
-        details = await get_player_details(player['id'])
+            # Show the top match and mention other possibilities
+            others = ", ".join([p.full_name for p in matches[1:4]])
+            if len(matches) > 4:
+                others += "..."
+            await ctx.send(f"Multiple matches found. Showing {player.full_name}. (Others: {others})")
+
+        details = await get_player_details(player.id)
         if not details:
-            await ctx.send(f"Could not fetch details for {player['firstName']} {player['lastName']}.")
+            await ctx.send(f"Could not fetch details for {player.full_name}.")
             return
             
         try:
             card_buffer = await generate_player_card(details)
-            file = discord.File(fp=card_buffer, filename=f"{player['lastName']}_card.png")
+            file = discord.File(fp=card_buffer, filename=f"{player.last_name}_card.{image_extension()}")
             await ctx.send(file=file)
         except Exception as e:
             await ctx.send(f"Error generating player card: {str(e)}")
@@ -180,6 +283,11 @@ async def player_card(ctx, *, name: str):
 @bot.command(name='standings', help='Shows the NHL playoff picture (division leaders and wildcards).')
 async def standings_command(ctx):
     async with ctx.typing():
+        image_buffer = get_prerendered("standings")
+        if image_buffer:
+            await ctx.send(file=discord.File(fp=image_buffer, filename=f"nhl_standings.{image_extension()}"))
+            return
+
         data = await get_standings()
         if not data:
             await ctx.send("Could not fetch standings data.")
@@ -187,7 +295,7 @@ async def standings_command(ctx):
             
         try:
             image_buffer = await generate_standings_image(data)
-            file = discord.File(fp=image_buffer, filename="nhl_standings.png")
+            file = discord.File(fp=image_buffer, filename=f"nhl_standings.{image_extension()}")
             await ctx.send(file=file)
         except Exception as e:
             await ctx.send(f"Error generating standings image: {str(e)}")
@@ -195,6 +303,11 @@ async def standings_command(ctx):
 @bot.command(name='conference', help='Shows the current NHL standings for both conferences.')
 async def conference_command(ctx):
     async with ctx.typing():
+        image_buffer = get_prerendered("conference")
+        if image_buffer:
+            await ctx.send(file=discord.File(fp=image_buffer, filename=f"nhl_league_standings.{image_extension()}"))
+            return
+
         data = await get_standings()
         if not data:
             await ctx.send("Could not fetch standings data.")
@@ -202,7 +315,7 @@ async def conference_command(ctx):
             
         try:
             image_buffer = await generate_conference_image(data)
-            file = discord.File(fp=image_buffer, filename="nhl_league_standings.png")
+            file = discord.File(fp=image_buffer, filename=f"nhl_league_standings.{image_extension()}")
             await ctx.send(file=file)
         except Exception as e:
             await ctx.send(f"Error generating conference image: {str(e)}")
@@ -210,26 +323,112 @@ async def conference_command(ctx):
 @bot.command(name='o-next', help='Shows the next Olympic hockey games.')
 async def olympic_next(ctx):
     async with ctx.typing():
-        # Determine "today" and "tomorrow" based on America/New_York timezone
-        now_et = datetime.now(ZoneInfo("America/New_York"))
-        today_et = now_et.date()
-        tomorrow_et = today_et + timedelta(days=1)
-        
-        all_games = []
-        for date in [today_et, tomorrow_et]:
-            games = await get_olympic_schedule(date)
-            if not games:
-                all_games.append({"no_games": True, "date": date})
-            else:
-                all_games.extend(games)
+        image_buffer = get_prerendered("olympic_schedule")
+        if image_buffer:
+            await ctx.send(file=discord.File(fp=image_buffer, filename=f"olympic_schedule.{image_extension()}"))
+            return
+
+        all_games, today_et = await build_olympic_games()
         
         try:
             image_buffer = await generate_olympic_schedule_image(all_games, today_et)
-            file = discord.File(fp=image_buffer, filename="olympic_schedule.png")
+            file = discord.File(fp=image_buffer, filename=f"olympic_schedule.{image_extension()}")
             await ctx.send(file=file)
         except Exception as e:
             await ctx.send(f"Error generating Olympic schedule image: {str(e)}")
 
+def _ms(seconds):
+    if seconds is None:
+        return "-"
+    if seconds == float("inf"):
+        return ">10s"
+    return f"{seconds * 1000:.0f}ms"
+
+def format_bot_stats():
+    """
+    Text summary of the metrics registry for !botstats. Latencies are histogram
+    bucket bounds, so "p95 250ms" means at most 250ms.
+    """
+    lines = ["**Commands**"]
+    counts = {}
+    for (command, status), n in metrics.COMMANDS_TOTAL.values.items():
+        counts.setdefault(command, {})[status] = n
+    for command, by_status in sorted(counts.items()):
+        p50 = metrics.COMMAND_SECONDS.quantile(0.5, command=command)
+        p95 = metrics.COMMAND_SECONDS.quantile(0.95, command=command)
+        lines.append(f"`!{command}` {by_status.get('ok', 0)} ok, {by_status.get('error', 0)} failed, p50 {_ms(p50)}, p95 {_ms(p95)}")
+    if not counts:
+        lines.append("No commands yet")
+
+    lines.append("**Upstream**")
+    requests = {}
+    for (endpoint, status), n in metrics.UPSTREAM_REQUESTS.values.items():
+        requests.setdefault(endpoint, {})[status] = n
+    busiest = sorted(requests.items(), key=lambda item: -sum(item[1].values()))[:8]
+    for endpoint, by_status in busiest:
+        total = sum(by_status.values())
+        failed = total - by_status.get("200", 0) - by_status.get("304", 0)
+        p95 = metrics.UPSTREAM_SECONDS.quantile(0.95, endpoint=endpoint)
+        kib = metrics.UPSTREAM_BYTES.values.get((endpoint,), 0) / 1024
+        lines.append(f"`{endpoint}` {total} req, {failed} failed, p95 {_ms(p95)}, {kib:.0f} KiB")
+    if not requests:
+        lines.append("No upstream requests yet")
+    unhealthy = {host: state for host, state in breaker_states().items() if state != "closed"}
+    if unhealthy:
+        lines.append("Circuit breakers: " + ", ".join(f"{host} {state}" for host, state in unhealthy.items()))
+
+    lines.append("**Caches**")
+    for name, (stats, size) in metrics.CACHES.items():
+        rate = metrics.cache_hit_rate(name)
+        rate_str = f"{rate:.0%} hits" if rate is not None else "unused"
+        entries = f", {size()} entries" if size else ""
+        lines.append(f"{name}: {rate_str} of {sum(stats.values())}{entries}")
+
+    lines.append(f"**Rendering** ({IMAGE_FORMAT}; p50 draw / encode, mean size)")
+    for (kind,) in metrics.RENDER_SECONDS.values:
+        draw = metrics.RENDER_SECONDS.quantile(0.5, kind=kind)
+        encode = metrics.ENCODE_SECONDS.quantile(0.5, kind=kind)
+        _, total, count = metrics.ENCODED_BYTES.values.get((kind, image_format_for(kind)), (None, 0, 0))
+        size = f"{total / count / 1024:.0f} KiB" if count else "-"
+        lines.append(f"{kind}: {_ms(draw)} / {_ms(encode)}, {size}")
+    return "\n".join(lines)
+
+def admin_only():
+    return commands.check_any(commands.is_owner(), commands.has_permissions(administrator=True))
+
+@bot.command(name='botstats', help='Shows command, upstream, cache and render statistics (admins only).')
+@admin_only()
+async def bot_stats(ctx):
+    await ctx.send(format_bot_stats()[:2000])
+
+@bot.command(name='profile', help='Runs a command once with profiling and attaches its span tree (admins only), e.g. !profile player McDavid')
+@admin_only()
+async def profile_command(ctx, *, command_line: str):
+    # Re-dispatch the rest of the message as its own command, flagged for profiling
+    message = copy.copy(ctx.message)
+    message.content = f"{ctx.prefix}{command_line}"
+    profiled_ctx = await bot.get_context(message)
+    if profiled_ctx.command is None or profiled_ctx.command in (profile_command, bot_stats):
+        await ctx.send(f"Can't profile '{command_line.split()[0]}'.")
+        return
+
+    profiled_ctx.profile_requested = True
+    await bot.invoke(profiled_ctx)
+
+    root = getattr(profiled_ctx, "profile_root", None)
+    if root is None:
+        await ctx.send("The command didn't run, so there is no profile.")
+        return
+    tree = profiling.format_tree(root)[:1900]
+    files = [discord.File(path) for path in profiled_ctx.profile_paths]
+    await ctx.send(f"```\n{tree}\n```", files=files)
+
+@bot_stats.error
+@profile_command.error
+async def admin_command_error(ctx, error):
+    if isinstance(error, commands.CheckFailure):
+        await ctx.send("This command is only available to server administrators.")
+
 if __name__ == "__main__":
     if TOKEN:
         bot.run(TOKEN)
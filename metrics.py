@@ -0,0 +1,180 @@
+import os
+import bisect
+
+# In-process counters and histograms, served in the Prometheus text format on
+# METRICS_HOST:METRICS_PORT/metrics. METRICS_PORT=0 turns the endpoint off.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT") or "9108")
+
+# Seconds; covers cache hits (sub-millisecond) up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _format_labels(self.labelnames, key), value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def quantile(self, q, **labels):
+        # Upper bound of the bucket holding the q-th observation
+        entry = self.values.get(_label_key(self.labelnames, labels))
+        if not entry or not entry[2]:
+            return None
+        target = q * entry[2]
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), entry[0]):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, key, [("le", le)]), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), count
+
+class Callback:
+    """
+    A metric read at scrape time from state another module already keeps
+    (cache stats dicts, cache sizes). fn returns {label tuple: value}.
+    """
+
+    def __init__(self, name, help_text, kind, labelnames, fn):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    @property
+    def values(self):
+        try:
+            return {tuple(str(v) for v in key): value for key, value in self.fn().items()}
+        except Exception:
+            return {}
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _format_labels(self.labelnames, key), value
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def counter(name, help_text, labelnames=()):
+    return _register(Counter(name, help_text, labelnames))
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help_text, labelnames, buckets))
+
+def callback(name, help_text, kind, labelnames, fn):
+    return _register(Callback(name, help_text, kind, labelnames, fn))
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+_runner = None
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    global _runner
+    if not port or _runner is not None:
+        return None
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    _runner = web.AppRunner(app)
+    await _runner.setup()
+    await web.TCPSite(_runner, host, port).start()
+    return _runner
+
+async def stop_metrics_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+    _runner = None
+
+# cache name -> (stats dict of result -> count, zero-argument size function)
+CACHES = {}
+
+def register_cache(name, stats, size=None):
+    # stats is the dict the cache already updates ({"hits": n, "misses": n, ...})
+    CACHES[name] = (stats, size)
+
+def cache_hit_rate(name):
+    stats, _ = CACHES[name]
+    lookups = sum(stats.values())
+    return stats.get("hits", 0) / lookups if lookups else None
+
+callback("nhl_bot_cache_requests_total", "Cache lookups by cache and result", "counter", ("cache", "result"),
+         lambda: {(name, result): n for name, (stats, _) in CACHES.items() for result, n in stats.items()})
+callback("nhl_bot_cache_entries", "Entries held per cache", "gauge", ("cache",),
+         lambda: {(name,): size() for name, (_, size) in CACHES.items() if size})
+
+# Shared metrics recorded by more than one module
+COMMAND_SECONDS = histogram("nhl_bot_command_seconds", "Bot command latency", ("command",))
+COMMANDS_TOTAL = counter("nhl_bot_commands_total", "Bot commands handled", ("command", "status"))
+UPSTREAM_SECONDS = histogram("nhl_bot_upstream_request_seconds", "Upstream HTTP request latency", ("endpoint",))
+UPSTREAM_REQUESTS = counter("nhl_bot_upstream_requests_total", "Upstream HTTP requests", ("endpoint", "status"))
+UPSTREAM_BYTES = counter("nhl_bot_upstream_bytes_total", "Upstream response body bytes", ("endpoint",))
+RENDER_SECONDS = histogram("nhl_bot_render_seconds", "Time spent drawing an image, excluding encoding", ("kind",))
+ENCODE_SECONDS = histogram("nhl_bot_encode_seconds", "Time spent encoding a drawn image", ("kind",))
+ENCODED_BYTES = histogram("nhl_bot_encoded_bytes", "Encoded image size", ("kind", "format"),
+                          buckets=(16384, 32768, 65536, 131072, 262144, 524288, 1048576, 2097152))
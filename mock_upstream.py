@@ -0,0 +1,463 @@
+"""
+Local stand-in for every upstream the bot talks to: api-web.nhle.com,
+site.api.espn.com, sports.core.api.espn.com and the logo/headshot/flag CDNs.
+Point the bot at it with UPSTREAM_BASE_URL (see http_client.py); requests then
+arrive here as /{host}/{path}.
+
+Each request is answered from, in order:
+  1. a recorded payload under fixtures/upstream/{host}/{path}
+     (API responses are stored as {path}.json; a query-specific recording
+     can be saved as {path}__{query}.json)
+  2. a payload synthesized from fixtures/ (standings, rosters, a league
+     schedule around today, scoreboards, the Olympic $ref graph, stub images)
+  3. 404
+
+Usage:
+  python mock_upstream.py [--port 8089] [--latency 50] [--jitter 25]
+                          [--error-rate 0.05] [--hang-rate 0.01]
+                          [--slow-body 2048] [--host api-web.nhle.com ...]
+  UPSTREAM_BASE_URL=http://127.0.0.1:8089 python main.py
+
+Faults only apply to the hosts given with --host (all hosts by default) and can
+be changed while the server runs: POST /_control with a JSON object of the same
+settings. GET /_stats returns request counts per host and status.
+"""
+import io
+import os
+import re
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from urllib.parse import urlencode
+from aiohttp import web
+from PIL import Image, ImageDraw
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDINGS_DIR = os.path.join(FIXTURES_DIR, "upstream")
+
+# ESPN uses shorter abbreviations for a few clubs (mirrors nhl_api.NHL_TO_ESPN_ABBR)
+NHL_TO_ESPN_ABBR = {"LAK": "LA", "TBL": "TB", "NJD": "NJ", "SJS": "SJ"}
+OLYMPIC_LEAGUE_SLUGS = {"olympics-mens-ice-hockey": "men", "olympics-womens-ice-hockey": "women"}
+
+# A hung request sleeps this long, well past any client timeout
+HANG_SECONDS = 3600
+SLOW_BODY_TICK = 0.1
+
+FAULTS = {
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+    "error_rate": 0.0,
+    "error_status": 503,
+    "hang_rate": 0.0,
+    "slow_body_bps": 0,
+    "hosts": [],
+}
+STATS = Counter()
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+# Stub images, sized like the real CDN assets
+def _png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _color(seed):
+    h = int(hashlib.md5(seed.encode()).hexdigest()[:6], 16)
+    return (h % 200 + 40, (h >> 8) % 200 + 40, (h >> 16) % 200 + 40)
+
+def stub_logo(seed):
+    img = Image.new("RGBA", (500, 500), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([20, 20, 480, 480], fill=_color(seed))
+    draw.rectangle([150, 200, 350, 300], fill=(255, 255, 255))
+    return _png(img)
+
+def stub_headshot(seed):
+    img = Image.new("RGBA", (600, 600), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([180, 60, 420, 340], fill=(224, 190, 160))
+    draw.rectangle([80, 360, 520, 600], fill=_color(seed))
+    return _png(img)
+
+def stub_flag(seed):
+    img = Image.new("RGB", (160, 107), _color(seed))
+    ImageDraw.Draw(img).rectangle([0, 36, 160, 71], fill=(255, 255, 255))
+    return _png(img)
+
+@lru_cache(maxsize=512)
+def stub_image(url):
+    if "teamlogos" in url:
+        return stub_logo(url)
+    if "flagcdn" in url:
+        return stub_flag(url)
+    return stub_headshot(url)
+
+# Synthesized league: every team plays every other day, pairings rotate daily
+@lru_cache(maxsize=1)
+def league_teams():
+    return [t["teamAbbrev"]["default"] for t in load_fixture("standings.json")["standings"]]
+
+def _iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+@lru_cache(maxsize=4)
+def league_schedule(today):
+    teams = league_teams()
+    games = []
+    for day in range(-3, 45):
+        playing = [t for j, t in enumerate(teams) if (day + j) % 2 == 0]
+        shift = day % len(playing)
+        playing = playing[shift:] + playing[:shift]
+        game_date = today + timedelta(days=day)
+        for k in range(len(playing) // 2):
+            home, away = playing[2 * k], playing[2 * k + 1]
+            start = datetime(game_date.year, game_date.month, game_date.day, 23, tzinfo=timezone.utc) + timedelta(minutes=15 * (k % 3))
+            if k % 4 == 0:
+                broadcasts = [{"network": "TNT", "market": "N"}]
+            else:
+                broadcasts = [{"network": f"{home}-TV", "market": "H"}, {"network": f"{away}-TV", "market": "A"}]
+            games.append({
+                "id": 2025020000 + (day + 3) * 100 + k,
+                "gameType": 2,
+                "startTimeUTC": _iso(start),
+                "homeTeam": {"abbrev": home},
+                "awayTeam": {"abbrev": away},
+                "tvBroadcasts": broadcasts,
+            })
+    return games
+
+def _schedule():
+    return league_schedule(datetime.now(timezone.utc).date())
+
+def _team_games(team):
+    return [g for g in _schedule() if team in (g["homeTeam"]["abbrev"], g["awayTeam"]["abbrev"])]
+
+def club_schedule_season(match, query):
+    return {"games": _team_games(match["team"])}
+
+def club_schedule_week(match, query):
+    now = datetime.now(timezone.utc)
+    end = _iso(now + timedelta(days=7))
+    return {"games": [g for g in _team_games(match["team"]) if _iso(now) <= g["startTimeUTC"] <= end]}
+
+def scoreboard(match, query):
+    # dates=YYYYMMDD or YYYYMMDD-YYYYMMDD. Games start 23:00-23:30 UTC, so the
+    # UTC date is also the Eastern date the bot keys scoreboards on.
+    dates = query.get("dates", "")
+    first, _, last = dates.partition("-")
+    last = last or first
+    events = []
+    for g in _schedule():
+        day = g["startTimeUTC"][:10].replace("-", "")
+        if not (first <= day <= last):
+            continue
+        national = any(b["market"] == "N" for b in g["tvBroadcasts"])
+        names = [b["network"] for b in g["tvBroadcasts"]] + ([] if national else ["ESPN+"])
+        competitors = [
+            {"homeAway": side, "team": {"abbreviation": NHL_TO_ESPN_ABBR.get(g[key]["abbrev"], g[key]["abbrev"])}}
+            for side, key in (("home", "homeTeam"), ("away", "awayTeam"))
+        ]
+        events.append({
+            "date": g["startTimeUTC"][:16] + "Z",
+            "competitions": [{"date": g["startTimeUTC"][:16] + "Z", "competitors": competitors, "broadcasts": [{"names": names}]}],
+        })
+    return {"events": events}
+
+def standings(match, query):
+    return load_fixture("standings.json")
+
+def playoff_bracket(match, query):
+    return {"series": []}
+
+FIRST_NAMES = ["Connor", "Tage", "Jack", "Quinn", "Elias", "Mikko", "Tim", "Juraj", "Nikita", "Rasmus",
+               "Owen", "Matty", "Lukas", "Jesper", "Kirill", "Auston", "Mitch", "Adam", "Logan", "Zach"]
+LAST_NAMES = ["Thompson", "Hughes", "Pettersson", "Rantanen", "Stützle", "Slafkovský", "Kucherov", "Dahlin",
+              "Power", "Beniers", "Reinbacher", "Bratt", "Kaprizov", "Matthews", "Marner", "Fox", "Cooley",
+              "Werenski", "Šimon", "Ødegård", "Tkachuk", "Nylander", "Larkin", "Kempe"]
+ROSTER_SHAPE = (("forwards", ("C", "L", "R"), 14), ("defensemen", ("D",), 8), ("goalies", ("G",), 3))
+
+@lru_cache(maxsize=64)
+def team_roster(team):
+    teams = league_teams()
+    if team not in teams:
+        return None
+    t = teams.index(team)
+    roster = {}
+    n = 0
+    for group, positions, count in ROSTER_SHAPE:
+        roster[group] = []
+        for i in range(count):
+            roster[group].append({
+                "id": 8470000 + t * 100 + n,
+                "firstName": {"default": FIRST_NAMES[(t * 7 + n * 3) % len(FIRST_NAMES)]},
+                "lastName": {"default": LAST_NAMES[(t * 5 + n * 7) % len(LAST_NAMES)]},
+                "positionCode": positions[i % len(positions)],
+            })
+            n += 1
+    # The recorded landing page player is on his real team so search -> card lines up
+    skater = load_fixture("player_landing.json")
+    if team == skater["currentTeamAbbrev"]:
+        roster["forwards"][0] = {"id": skater["playerId"], "firstName": skater["firstName"],
+                                 "lastName": skater["lastName"], "positionCode": skater["position"]}
+    return roster
+
+def roster(match, query):
+    return team_roster(match["team"])
+
+def _find_rostered(player_id):
+    for team in league_teams():
+        for group in team_roster(team).values():
+            for p in group:
+                if p["id"] == player_id:
+                    return team, p
+    return None, None
+
+def player_landing(match, query):
+    player_id = int(match["id"])
+    skater = load_fixture("player_landing.json")
+    goalie = load_fixture("goalie_landing.json")
+    for recorded in (skater, goalie):
+        if recorded["playerId"] == player_id:
+            return recorded
+    team, p = _find_rostered(player_id)
+    if p is None:
+        return None
+    data = goalie if p["positionCode"] == "G" else skater
+    data.update({
+        "playerId": player_id,
+        "currentTeamAbbrev": team,
+        "fullTeamName": {"default": team},
+        "firstName": p["firstName"],
+        "lastName": p["lastName"],
+        "position": p["positionCode"],
+        "sweaterNumber": player_id % 98 + 1,
+        "headshot": f"https://assets.nhle.com/mugs/nhl/20252026/{team}/{player_id}.png",
+    })
+    return data
+
+# Olympic $ref graph. The recorded tournament is replayed as if its first day were today.
+OLYMPIC_BASE = "https://sports.core.api.espn.com/v2/sports/hockey/leagues"
+
+def _olympic_games(slug, date_key):
+    data = load_fixture("olympic_schedule.json")
+    first_day = datetime.strptime(data["target_date"], "%Y-%m-%d").date()
+    today = datetime.now(timezone.utc).date()
+    wanted = datetime.strptime(date_key, "%Y%m%d").date()
+    league = OLYMPIC_LEAGUE_SLUGS.get(slug)
+    games = []
+    for i, g in enumerate(data["games"]):
+        offset = datetime.strptime(g["date"], "%Y-%m-%d").date() - first_day
+        if g["league"] == league and today + offset == wanted:
+            start = datetime.fromisoformat(g["time_utc"].replace("Z", "+00:00")) + (today - first_day)
+            games.append((f"{date_key}{i:02d}", dict(g, time_utc=start.strftime("%Y-%m-%dT%H:%MZ"))))
+    return games
+
+def olympic_events(match, query):
+    slug = match["league"]
+    items = [{"$ref": f"{OLYMPIC_BASE}/{slug}/events/{eid}?lang=en"}
+             for eid, _ in _olympic_games(slug, query.get("dates", ""))]
+    return {"count": len(items), "items": items}
+
+def _olympic_game(slug, event_id):
+    for eid, g in _olympic_games(slug, event_id[:8]):
+        if eid == event_id:
+            return g
+    return None
+
+def olympic_event(match, query):
+    slug, eid = match["league"], match["event"]
+    game = _olympic_game(slug, eid)
+    if game is None:
+        return None
+    return {"id": eid, "date": game["time_utc"],
+            "competitions": [{"$ref": f"{OLYMPIC_BASE}/{slug}/events/{eid}/competitions/{eid}?lang=en"}]}
+
+def olympic_competition(match, query):
+    slug, eid = match["league"], match["event"]
+    game = _olympic_game(slug, eid)
+    if game is None:
+        return None
+    competitors = [
+        {"homeAway": side, "team": {"$ref": f"{OLYMPIC_BASE}/{slug}/teams/{game[side]['abbreviation']}?lang=en"}}
+        for side in ("home", "away")
+    ]
+    return {"id": eid, "date": game["time_utc"], "description": game["round"], "competitors": competitors}
+
+def olympic_team(match, query):
+    abbr = match["abbr"]
+    for g in load_fixture("olympic_schedule.json")["games"]:
+        for side in ("home", "away"):
+            if g[side]["abbreviation"] == abbr:
+                return {"abbreviation": abbr, "displayName": g[side]["name"]}
+    return None
+
+def cdn_image(match, query):
+    return stub_image(match.string)
+
+SYNTHESIZERS = [
+    ("api-web.nhle.com", r"v1/club-schedule-season/(?P<team>\w+)/now", club_schedule_season),
+    ("api-web.nhle.com", r"v1/club-schedule/(?P<team>\w+)/week/now", club_schedule_week),
+    ("api-web.nhle.com", r"v1/standings/[\w-]+", standings),
+    ("api-web.nhle.com", r"v1/playoff-bracket/\d+", playoff_bracket),
+    ("api-web.nhle.com", r"v1/roster/(?P<team>\w+)/current", roster),
+    ("api-web.nhle.com", r"v1/player/(?P<id>\d+)/landing", player_landing),
+    ("site.api.espn.com", r"apis/site/v2/sports/hockey/nhl/scoreboard", scoreboard),
+    ("sports.core.api.espn.com", r"v2/sports/hockey/leagues/(?P<league>[\w-]+)/events", olympic_events),
+    ("sports.core.api.espn.com", r"v2/sports/hockey/leagues/(?P<league>[\w-]+)/events/(?P<event>\d+)", olympic_event),
+    ("sports.core.api.espn.com", r"v2/sports/hockey/leagues/(?P<league>[\w-]+)/events/(?P<event>\d+)/competitions/\d+", olympic_competition),
+    ("sports.core.api.espn.com", r"v2/sports/hockey/leagues/(?P<league>[\w-]+)/teams/(?P<abbr>\w+)", olympic_team),
+    ("a.espncdn.com", r".+\.png", cdn_image),
+    ("assets.nhle.com", r".+\.png", cdn_image),
+    ("flagcdn.com", r".+\.png", cdn_image),
+]
+SYNTHESIZERS = [(host, re.compile(pattern), fn) for host, pattern, fn in SYNTHESIZERS]
+
+def _recorded(host, path, query):
+    root = os.path.realpath(os.path.join(RECORDINGS_DIR, host))
+    candidates = []
+    if query:
+        safe_query = re.sub(r"[^\w.-]", "_", urlencode(sorted(query.items())))
+        candidates.append(f"{path}__{safe_query}.json")
+    candidates += [f"{path}.json", path]
+    for candidate in candidates:
+        full = os.path.realpath(os.path.join(root, candidate))
+        # Never serve anything outside the recordings directory
+        if not full.startswith(root + os.sep) or not os.path.isfile(full):
+            continue
+        with open(full, "rb") as f:
+            body = f.read()
+        return body, "application/json" if full.endswith(".json") else "image/png"
+    return None
+
+def resolve(host, path, query):
+    """
+    Returns (body bytes, content type) for an upstream request, or None.
+    """
+    recorded = _recorded(host, path, query)
+    if recorded:
+        return recorded
+    for synth_host, pattern, fn in SYNTHESIZERS:
+        if synth_host != host:
+            continue
+        match = pattern.fullmatch(path)
+        if not match:
+            continue
+        payload = fn(match, query)
+        if payload is None:
+            return None
+        if isinstance(payload, bytes):
+            return payload, "image/png"
+        return json.dumps(payload).encode(), "application/json"
+    return None
+
+def _faults_apply(host):
+    return not FAULTS["hosts"] or host in FAULTS["hosts"]
+
+async def _inject_delay():
+    delay = FAULTS["latency_ms"] + random.uniform(-FAULTS["jitter_ms"], FAULTS["jitter_ms"])
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+async def _slow_response(request, body, headers):
+    response = web.StreamResponse(headers=headers)
+    response.content_length = len(body)
+    await response.prepare(request)
+    chunk = max(1, int(FAULTS["slow_body_bps"] * SLOW_BODY_TICK))
+    for i in range(0, len(body), chunk):
+        await response.write(body[i:i + chunk])
+        await asyncio.sleep(SLOW_BODY_TICK)
+    await response.write_eof()
+    return response
+
+async def handle_upstream(request):
+    host = request.match_info["host"]
+    path = request.match_info["path"]
+    faulty = _faults_apply(host)
+
+    if faulty:
+        await _inject_delay()
+        if random.random() < FAULTS["hang_rate"]:
+            STATS[(host, "hang")] += 1
+            await asyncio.sleep(HANG_SECONDS)
+        if random.random() < FAULTS["error_rate"]:
+            STATS[(host, FAULTS["error_status"])] += 1
+            return web.Response(status=FAULTS["error_status"], text="injected failure")
+
+    resolved = resolve(host, path, dict(request.query))
+    if resolved is None:
+        STATS[(host, 404)] += 1
+        return web.Response(status=404)
+    body, content_type = resolved
+
+    # ETags let the bot's response cache revalidate against the mock like the real APIs
+    etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+    if request.headers.get("If-None-Match") == etag:
+        STATS[(host, 304)] += 1
+        return web.Response(status=304, headers={"ETag": etag})
+
+    STATS[(host, 200)] += 1
+    headers = {"ETag": etag, "Content-Type": content_type}
+    if faulty and FAULTS["slow_body_bps"]:
+        return await _slow_response(request, body, headers)
+    return web.Response(body=body, headers=headers)
+
+async def handle_stats(request):
+    requests = {f"{host} {status}": count for (host, status), count in sorted(STATS.items(), key=str)}
+    return web.json_response({"requests": requests, "faults": FAULTS})
+
+async def handle_control(request):
+    try:
+        changes = await request.json()
+    except ValueError:
+        return web.json_response({"error": "expected a JSON object"}, status=400)
+    unknown = set(changes) - set(FAULTS)
+    if unknown:
+        return web.json_response({"error": f"unknown settings: {sorted(unknown)}"}, status=400)
+    FAULTS.update(changes)
+    return web.json_response(FAULTS)
+
+def build_app():
+    app = web.Application()
+    app.router.add_get("/_stats", handle_stats)
+    app.router.add_post("/_control", handle_control)
+    app.router.add_get("/{host}/{path:.*}", handle_upstream)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded and synthesized NHL/ESPN upstream payloads locally.")
+    parser.add_argument("--host-address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random latency (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that never answer")
+    parser.add_argument("--slow-body", type=int, default=0, help="stream bodies at this many bytes/second")
+    parser.add_argument("--host", action="append", default=[], help="only inject faults for this upstream host")
+    parser.add_argument("--seed", type=int, help="seed for reproducible fault injection")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    FAULTS.update({
+        "latency_ms": args.latency,
+        "jitter_ms": args.jitter,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+        "hang_rate": args.hang_rate,
+        "slow_body_bps": args.slow_body,
+        "hosts": args.host,
+    })
+    print(f"Mock upstream on http://{args.host_address}:{args.port} (set UPSTREAM_BASE_URL to this)")
+    web.run_app(build_app(), host=args.host_address, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
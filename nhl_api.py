@@ -1,11 +1,42 @@
-import aiohttp
+import time
 import asyncio
+import bisect
 import pycountry
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
+from http_client import fetch_json
+import metrics
+import profiling
+from roster_store import Player, RosterStore
+from singleflight import coalesce
 
 EASTERN = ZoneInfo("America/New_York")
-ROSTER_CACHE = {"teams": None, "players": [], "last_updated": None}
+# teams: team abbr -> {"raw": roster payload, "players": [Player]}; store: the searchable league snapshot
+ROSTER_CACHE = {"teams": {}, "store": RosterStore(), "last_updated": None}
+# Player searches by snapshot state: fresh, stale (served while refreshing), or not loaded yet
+ROSTER_CACHE_STATS = {"hits": 0, "stale": 0, "misses": 0}
+ROSTER_REFRESH_INTERVAL = timedelta(days=1)
+# A refresh where any team failed is retried sooner, backing off from the first delay to the second
+ROSTER_RETRY_DELAYS = (timedelta(minutes=1), timedelta(hours=1))
+ROSTER_FETCH_CONCURRENCY = 6
+_roster_refresh_task = None
+
+# Response cache TTLs (seconds) per NHL web API endpoint class
+CACHE_TTLS = {
+    "standings": 5 * 60,
+    "player": 15 * 60,
+    "schedule": 30 * 60,
+    "roster": 6 * 60 * 60,
+    "olympic_team": 24 * 60 * 60,
+}
+
+# team -> {"games": [Game], "starts", "loaded", "window_refreshed"}; games sorted by start time
+SCHEDULE_INDEX = {}
+SEASON_RELOAD_INTERVAL = timedelta(hours=12)
+WINDOW_REFRESH_INTERVAL = timedelta(minutes=10)
+_SCHEDULE_REFRESHES = {}
+# Strong references to in-flight background refreshes until they finish
+_REFRESH_TASKS = set()
 
 async def fetch_next_game(team_abbr: str):
     game = await get_next_game_info(team_abbr)
@@ -13,156 +44,212 @@ async def fetch_next_game(team_abbr: str):
         return format_game_info(game)
     return "No upcoming games found."
 
+class SeriesState:
+    """
+    Playoff series standing. team_is_top is None when the schedule payload
+    doesn't say which seed the team is.
+    """
+    __slots__ = ("title", "game_number", "top_wins", "bottom_wins", "team_is_top")
+
+    def __init__(self, status, team_is_top=None):
+        status = status or {}
+        self.title = status.get("seriesTitle", "Playoffs")
+        self.game_number = status.get("gameNumberOfSeries")
+        self.top_wins = status.get("topSeedWins", 0)
+        self.bottom_wins = status.get("bottomSeedWins", 0)
+        self.team_is_top = team_is_top
+
+    def summary(self, series_label=True):
+        top_wins, bot_wins = self.top_wins, self.bottom_wins
+        if top_wins == bot_wins:
+            return f"Series Tied {top_wins}-{bot_wins}"
+        if self.team_is_top is None:
+            # We don't know who is top seed from club-schedule, so just show the score
+            return f"Series: {top_wins}-{bot_wins}"
+        is_top = self.team_is_top
+        score_str = f"{top_wins}-{bot_wins}" if is_top else f"{bot_wins}-{top_wins}"
+        leading = (is_top and top_wins > bot_wins) or (not is_top and bot_wins > top_wins)
+        label = "Leading" if leading else "Trailing"
+        return f"{label} Series {score_str}" if series_label else f"{label} {score_str}"
+
+class Game:
+    """
+    A team's game, parsed once at ingest so the text and image paths
+    never re-parse start times or payload strings.
+    TBD games (playoff series without a scheduled next game) have no start time.
+    """
+    __slots__ = ("game_id", "team_abbr", "opponent_abbr", "home_abbr", "away_abbr", "is_home",
+                 "start_utc", "start_et", "date_key", "game_type", "is_tbd", "series",
+                 "broadcasts", "networks")
+
+    def time_label(self, now_et=None):
+        if self.is_tbd:
+            return "Next Game TBD"
+        dt_et = self.start_et
+        # Compare against the current day in Eastern
+        now_et = now_et or datetime.now(EASTERN)
+        delta = dt_et.date() - now_et.date()
+        time_str = dt_et.strftime("%-I:%M %p")
+        
+        if delta.days == 0:
+            # Today @ TIME
+            return f"Today @ {time_str}"
+        elif 0 < delta.days < 7:
+            # WEEKDAY @ TIME
+            return f"{dt_et.strftime('%a')} @ {time_str}"
+        # SHORT_DATE @ TIME
+        return f"{dt_et.strftime('%a, %b %-d')} @ {time_str}"
+
+    def playoff_lines(self):
+        if self.is_tbd:
+            return [self.series.title, self.series.summary(series_label=False)]
+        if self.series:
+            return [f"Game {self.series.game_number}", self.series.summary()]
+        return []
+
+def build_game(raw, team_abbr):
+    game = Game()
+    game.game_id = raw.get("id")
+    game.team_abbr = team_abbr
+    game.home_abbr = raw["homeTeam"]["abbrev"]
+    game.away_abbr = raw["awayTeam"]["abbrev"]
+    game.is_home = game.home_abbr == team_abbr
+    game.opponent_abbr = game.away_abbr if game.is_home else game.home_abbr
+    game.start_utc = datetime.fromisoformat(raw["startTimeUTC"].replace("Z", "+00:00"))
+    game.start_et = game.start_utc.astimezone(EASTERN)
+    game.date_key = game.start_et.strftime("%Y%m%d")
+    game.game_type = raw.get("gameType")
+    game.is_tbd = False
+    game.series = SeriesState(raw["seriesStatus"]) if game.game_type == 3 and "seriesStatus" in raw else None
+
+    broadcasts = raw.get("tvBroadcasts", [])
+    game.networks = tuple(b.get("network") for b in broadcasts)
+    relevant = []
+    for b in broadcasts:
+        # Include National broadcasts or those matching our team's home/away status
+        market = b.get("market")
+        if market == "N" or (game.is_home and market == "H") or (not game.is_home and market == "A"):
+            network = b.get("network")
+            if network and network not in relevant:
+                relevant.append(network)
+    game.broadcasts = tuple(relevant)
+    return game
+
+def build_tbd_game(series, team_abbr):
+    # A "virtual" game for a team in a playoff series with no scheduled next game
+    top_abbr = series.get("topSeed", {}).get("abbrev")
+    bot_abbr = series.get("bottomSeed", {}).get("abbrev")
+    is_top = team_abbr == top_abbr
+
+    game = Game()
+    game.game_id = None
+    game.team_abbr = team_abbr
+    game.opponent_abbr = (bot_abbr if is_top else top_abbr) or "TBD"
+    game.home_abbr = game.away_abbr = None
+    game.is_home = False
+    game.start_utc = game.start_et = game.date_key = None
+    game.game_type = 3
+    game.is_tbd = True
+    game.series = SeriesState(series.get("seriesStatus"), team_is_top=is_top)
+    game.broadcasts = game.networks = ()
+    return game
+
+def _index_games(games):
+    # Keeps the team's games sorted by start time so the next one is a bisect away
+    games = sorted(games, key=lambda g: g.start_utc)
+    return games, [g.start_utc for g in games]
+
+async def load_season_schedule(team_abbr: str):
+    url = f"https://api-web.nhle.com/v1/club-schedule-season/{team_abbr}/now"
+    data = await fetch_json(url, ttl=CACHE_TTLS["schedule"])
+    if not data:
+        return SCHEDULE_INDEX.get(team_abbr)
+
+    games, starts = _index_games(build_game(g, team_abbr) for g in data.get("games", []))
+    now = datetime.now(timezone.utc)
+    entry = {"games": games, "starts": starts, "loaded": now, "window_refreshed": now}
+    SCHEDULE_INDEX[team_abbr] = entry
+    return entry
+
+async def refresh_schedule_window(team_abbr: str):
+    # Only the current week is re-pulled; it carries start time changes and
+    # broadcast updates for the games that matter, merged in by game id.
+    entry = SCHEDULE_INDEX.get(team_abbr)
+    if not entry:
+        return await load_season_schedule(team_abbr)
+
+    url = f"https://api-web.nhle.com/v1/club-schedule/{team_abbr}/week/now"
+    data = await fetch_json(url)
+    if data:
+        by_id = {g.game_id: g for g in entry["games"]}
+        for raw in data.get("games", []):
+            game = build_game(raw, team_abbr)
+            by_id[game.game_id] = game
+        entry["games"], entry["starts"] = _index_games(by_id.values())
+    entry["window_refreshed"] = datetime.now(timezone.utc)
+    return entry
+
+def _schedule_refresh(team_abbr: str, coro_fn):
+    # Refreshes run in the background while callers keep using the current index
+    task = _SCHEDULE_REFRESHES.get(team_abbr)
+    if task and not task.done():
+        return
+    task = profiling.detached(coro_fn(team_abbr))
+    _SCHEDULE_REFRESHES[team_abbr] = task
+    _REFRESH_TASKS.add(task)
+    task.add_done_callback(lambda t: _refresh_done(team_abbr, t))
+
+def _refresh_done(team_abbr: str, task):
+    _REFRESH_TASKS.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"Schedule refresh for {team_abbr} failed: {task.exception()}")
+
+@coalesce
 async def get_next_game_info(team_abbr: str):
-    headers = {"User-Agent": "Mozilla/5.0"}
     now = datetime.now(timezone.utc)
     
     try:
-        async with aiohttp.ClientSession() as session:
-            # 1. Try week/now
-            url = f"https://api-web.nhle.com/v1/club-schedule/{team_abbr}/week/now"
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    for game in data.get("games", []):
-                        game_time = datetime.fromisoformat(game["startTimeUTC"].replace("Z", "+00:00"))
-                        if game_time > now:
-                            return game
-                
-            # 2. Try month/now
-            month_url = f"https://api-web.nhle.com/v1/club-schedule/{team_abbr}/month/now"
-            async with session.get(month_url, headers=headers) as m_response:
-                if m_response.status == 200:
-                    m_data = await m_response.json()
-                    for game in m_data.get("games", []):
-                        game_time = datetime.fromisoformat(game["startTimeUTC"].replace("Z", "+00:00"))
-                        if game_time > now:
-                            return game
-            
-            # 3. Look ahead to NEXT month if current month is almost over or has no more games
-            # This is useful at the end of a month
-            next_month = (now.replace(day=28) + timedelta(days=4)).strftime("%Y-%m")
-            next_month_url = f"https://api-web.nhle.com/v1/club-schedule/{team_abbr}/month/{next_month}"
-            async with session.get(next_month_url, headers=headers) as nm_response:
-                if nm_response.status == 200:
-                    nm_data = await nm_response.json()
-                    for game in nm_data.get("games", []):
-                        game_time = datetime.fromisoformat(game["startTimeUTC"].replace("Z", "+00:00"))
-                        if game_time > now:
-                            return game
-
-            # 4. Fallback: Check Playoff Bracket if it's playoff season (April - June)
-            if 4 <= now.month <= 6:
-                year = now.year if now.month >= 4 else now.year - 1
-                bracket_url = f"https://api-web.nhle.com/v1/playoff-bracket/{year}"
-                async with session.get(bracket_url, headers=headers) as b_response:
-                    if b_response.status == 200:
-                        b_data = await b_response.json()
-                        # Find series involving the team
-                        for series in b_data.get("series", []):
-                            bottom_abbr = series.get("bottomSeed", {}).get("abbrev")
-                            top_abbr = series.get("topSeed", {}).get("abbrev")
-                            
-                            if team_abbr in [bottom_abbr, top_abbr]:
-                                # Team is in a series. Check if there are scheduled games we missed
-                                # Actually, if we are here, club-schedule failed.
-                                # Return a "virtual" game object indicating TBD status
-                                return {
-                                    "gameType": 3,
-                                    "isTBD": True,
-                                    "team_abbr": team_abbr,
-                                    "seriesStatus": series.get("seriesStatus"),
-                                    "topSeed": series.get("topSeed"),
-                                    "bottomSeed": series.get("bottomSeed")
-                                }
+        entry = SCHEDULE_INDEX.get(team_abbr)
+        if entry is None:
+            entry = await load_season_schedule(team_abbr)
+        elif now - entry["loaded"] > SEASON_RELOAD_INTERVAL:
+            _schedule_refresh(team_abbr, load_season_schedule)
+        elif now - entry["window_refreshed"] > WINDOW_REFRESH_INTERVAL:
+            _schedule_refresh(team_abbr, refresh_schedule_window)
+
+        if entry:
+            i = bisect.bisect_right(entry["starts"], now)
+            if i < len(entry["games"]):
+                return entry["games"][i]
+
+        # Fallback: Check Playoff Bracket if it's playoff season (April - June)
+        if 4 <= now.month <= 6:
+            year = now.year if now.month >= 4 else now.year - 1
+            bracket_url = f"https://api-web.nhle.com/v1/playoff-bracket/{year}"
+            b_data = await fetch_json(bracket_url, ttl=CACHE_TTLS["standings"])
+            if b_data:
+                # Find series involving the team
+                for series in b_data.get("series", []):
+                    bottom_abbr = series.get("bottomSeed", {}).get("abbrev")
+                    top_abbr = series.get("topSeed", {}).get("abbrev")
+                    
+                    if team_abbr in [bottom_abbr, top_abbr]:
+                        # Team is in a series but has no scheduled game in the index yet
+                        return build_tbd_game(series, team_abbr)
                                 
         return None
     except Exception:
         return None
 
 def format_game_info(game):
-    if game.get("isTBD"):
-        status = game.get("seriesStatus", {})
-        series_title = status.get("seriesTitle", "Playoffs")
-        top_wins = status.get("topSeedWins", 0)
-        bot_wins = status.get("bottomSeedWins", 0)
-        
-        # Find opponent
-        top_abbr = game.get("topSeed", {}).get("abbrev")
-        bot_abbr = game.get("bottomSeed", {}).get("abbrev")
-        is_top = game["team_abbr"] == top_abbr
-        opponent = bot_abbr if is_top else top_abbr
-        
-        if not opponent:
-            opponent = "TBD"
-            
-        score_str = f"{top_wins}-{bot_wins}" if is_top else f"{bot_wins}-{top_wins}"
-        
-        if top_wins == bot_wins:
-            summary = f"Series Tied {top_wins}-{bot_wins}"
-        elif (is_top and top_wins > bot_wins) or (not is_top and bot_wins > top_wins):
-            summary = f"Leading Series {score_str}"
-        else:
-            summary = f"Trailing Series {score_str}"
-            
-        return f"{game['team_abbr']} vs {opponent} ({series_title}) - {summary} (Next Game TBD)"
+    if game.is_tbd:
+        return f"{game.team_abbr} vs {game.opponent_abbr} ({game.series.title}) - {game.series.summary()} (Next Game TBD)"
 
-    home_team = game["homeTeam"]["abbrev"]
-    away_team = game["awayTeam"]["abbrev"]
-    start_time_utc = game["startTimeUTC"]
-    
-    dt_utc = datetime.fromisoformat(start_time_utc.replace("Z", "+00:00"))
-    dt_et = dt_utc.astimezone(EASTERN)
-    
-    # Get current time in Eastern for comparison
-    now_et = datetime.now(EASTERN)
-    
-    delta = dt_et.date() - now_et.date()
-    
-    if delta.days == 0:
-        # Today @ TIME
-        time_str = dt_et.strftime("%-I:%M %p")
-        formatted_time = f"Today @ {time_str}"
-    elif 0 < delta.days < 7:
-        # WEEKDAY @ TIME
-        weekday = dt_et.strftime("%a")
-        time_str = dt_et.strftime("%-I:%M %p")
-        formatted_time = f"{weekday} @ {time_str}"
-    else:
-        # SHORT_DATE @ TIME
-        date_str = dt_et.strftime("%a, %b %-d")
-        time_str = dt_et.strftime("%-I:%M %p")
-        formatted_time = f"{date_str} @ {time_str}"
-    
-    res = f"{away_team} @ {home_team} {formatted_time}"
+    res = f"{game.away_abbr} @ {game.home_abbr} {game.time_label()}"
     
     # Add playoff info if available
-    if game.get("gameType") == 3 and "seriesStatus" in game:
-        status = game["seriesStatus"]
-        g_num = status.get("gameNumberOfSeries")
-        top_wins = status.get("topSeedWins", 0)
-        bot_wins = status.get("bottomSeedWins", 0)
-        
-        home_is_top = (home_team == game.get("seriesStatus", {}).get("topSeed", {}).get("abbrev")) # Wait, seriesStatus might not have topSeed/bottomSeed info directly in the same way
-        # Let's check the structure again from the probe
-        
-        # Actually seriesStatus in club-schedule contains:
-        # "seriesStatus": {
-        #   "round": 1,
-        #   "seriesTitle": "1st Round",
-        #   "topSeedWins": 2,
-        #   "bottomSeedWins": 2,
-        #   "gameNumberOfSeries": 5
-        # }
-        
-        if top_wins == bot_wins:
-            series_summary = f"Series Tied {top_wins}-{bot_wins}"
-        else:
-            # We don't know who is top seed from this object alone in club-schedule usually, 
-            # but we can just show the score
-            series_summary = f"Series: {top_wins}-{bot_wins}"
-            
-        res += f" [Game {g_num} - {series_summary}]"
+    if game.series:
+        res += f" [{' - '.join(game.playoff_lines())}]"
         
     return res
 
@@ -172,139 +259,223 @@ NHL_TO_ESPN_ABBR = {
     "NJD": "NJ",
     "SJS": "SJ"
 }
+ESPN_TO_NHL_ABBR = {espn: nhl for nhl, espn in NHL_TO_ESPN_ABBR.items()}
 
-def is_on_espn_plus(game, scoreboard_data=None):
-    # First, try to use ESPN API data if provided
-    if scoreboard_data:
-        nhl_home = game["homeTeam"]["abbrev"]
-        nhl_away = game["awayTeam"]["abbrev"]
-        
-        # Map NHL abbreviations to ESPN abbreviations
-        home_abbr = NHL_TO_ESPN_ABBR.get(nhl_home, nhl_home)
-        away_abbr = NHL_TO_ESPN_ABBR.get(nhl_away, nhl_away)
-        
-        events = scoreboard_data.get("events", [])
-        for event in events:
-            competitions = event.get("competitions", [])
-            for comp in competitions:
-                competitors = comp.get("competitors", [])
-                teams = [c.get("team", {}).get("abbreviation") for c in competitors]
-                if home_abbr in teams and away_abbr in teams:
-                    broadcasts = comp.get("broadcasts", [])
-                    for b in broadcasts:
-                        if "ESPN+" in b.get("names", []):
-                            return True
-                    # If we found the game but ESPN+ is not listed
-                    return False
-
-    broadcasts = game.get("tvBroadcasts", [])
-    if not broadcasts:
+# "YYYYMMDD" (Eastern) -> {"games": {frozenset({home, away}): on ESPN+}, "expires": monotonic time}
+SCOREBOARD_INDEX = {}
+SCOREBOARD_INDEX_STATS = {"hits": 0, "misses": 0}
+SCOREBOARD_TTL = 10 * 60
+
+def _eastern_date_key(start_time):
+    if not start_time:
+        return None
+    dt_utc = datetime.fromisoformat(start_time.replace("Z", "+00:00"))
+    return dt_utc.astimezone(EASTERN).strftime("%Y%m%d")
+
+def build_scoreboard_index(scoreboard_data):
+    """
+    Flattens an ESPN scoreboard payload into {date: {team pair: on ESPN+}}.
+    Teams are stored under their NHL abbreviations.
+    """
+    index = {}
+    for event in scoreboard_data.get("events", []):
+        for comp in event.get("competitions", []):
+            teams = frozenset(
+                ESPN_TO_NHL_ABBR.get(abbr, abbr)
+                for abbr in (c.get("team", {}).get("abbreviation") for c in comp.get("competitors", []))
+                if abbr
+            )
+            date_key = _eastern_date_key(comp.get("date") or event.get("date"))
+            on_espn_plus = any("ESPN+" in b.get("names", []) for b in comp.get("broadcasts", []))
+            index.setdefault(date_key, {})[teams] = on_espn_plus
+    return index
+
+def _prune_scoreboard_index(now):
+    # Next games are always today or later, so expired past dates won't be asked for again
+    today = datetime.now(EASTERN).strftime("%Y%m%d")
+    for key in [k for k, entry in SCOREBOARD_INDEX.items() if k < today and entry["expires"] <= now]:
+        del SCOREBOARD_INDEX[key]
+
+async def get_espn_scoreboard_index(date_keys):
+    """
+    Returns {date: {team pair: on ESPN+}} for the given YYYYMMDD dates.
+    Dates are cached individually; all missing ones are fetched in one ranged request.
+    """
+    now = time.monotonic()
+    missing = sorted(d for d in set(date_keys) if d not in SCOREBOARD_INDEX or SCOREBOARD_INDEX[d]["expires"] <= now)
+    SCOREBOARD_INDEX_STATS["misses"] += len(missing)
+    SCOREBOARD_INDEX_STATS["hits"] += len(set(date_keys)) - len(missing)
+    if missing:
+        date_range = missing[0] if len(missing) == 1 else f"{missing[0]}-{missing[-1]}"
+        data = await get_espn_scoreboard(date_range)
+        if data:
+            index = build_scoreboard_index(data)
+            _prune_scoreboard_index(time.monotonic())
+            expires = time.monotonic() + SCOREBOARD_TTL
+            start = datetime.strptime(missing[0], "%Y%m%d")
+            end = datetime.strptime(missing[-1], "%Y%m%d")
+            day = start
+            while day <= end:
+                key = day.strftime("%Y%m%d")
+                SCOREBOARD_INDEX[key] = {"games": index.get(key, {}), "expires": expires}
+                day += timedelta(days=1)
+    return {d: SCOREBOARD_INDEX[d]["games"] for d in date_keys if d in SCOREBOARD_INDEX}
+
+def is_on_espn_plus(game, scoreboard_index=None):
+    # First, try to use the ESPN scoreboard index if provided
+    if scoreboard_index:
+        teams = frozenset((game.home_abbr, game.away_abbr))
+        on_espn_plus = scoreboard_index.get(game.date_key, {}).get(teams)
+        if on_espn_plus is not None:
+            return on_espn_plus
+
+    if not game.networks:
         return False
 
     # These networks are NOT on ESPN+
     excluded_networks = ["TNT", "NHLN", "truTV", "HBO MAX"]
-    for b in broadcasts:
-        if b.get("network") in excluded_networks:
+    for network in game.networks:
+        if network in excluded_networks:
             return False
 
     return True
 
+@coalesce
 async def get_espn_scoreboard(date_str: str):
     """
     Fetches the ESPN scoreboard for a given date or date range.
     date_str should be in YYYYMMDD or YYYYMMDD-YYYYMMDD format.
     """
     url = f"https://site.api.espn.com/apis/site/v2/sports/hockey/nhl/scoreboard?dates={date_str}"
-    headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    return await response.json()
+        return await fetch_json(url)
     except Exception:
         pass
     return None
 
+metrics.register_cache("roster", ROSTER_CACHE_STATS, lambda: len(ROSTER_CACHE["store"]))
+metrics.register_cache("scoreboard", SCOREBOARD_INDEX_STATS, lambda: len(SCOREBOARD_INDEX))
+
+def roster_ready():
+    return ROSTER_CACHE["last_updated"] is not None
+
+def roster_is_stale():
+    last_updated = ROSTER_CACHE["last_updated"]
+    return last_updated is None or datetime.now(timezone.utc) - last_updated > ROSTER_REFRESH_INTERVAL
+
 async def search_player(name: str):
     """
     Searches for a player by name. Since direct search is unreliable,
-    we fetch all team rosters and search through them.
+    we fetch all team rosters and search the index built from them.
+    Matches come back ranked, best first.
+    Never waits on a roster crawl: a stale snapshot keeps being served while
+    a background refresh runs.
     """
-    now = datetime.now(timezone.utc)
-    
-    # Refresh cache if empty or older than 1 day
-    if not ROSTER_CACHE["players"] or not ROSTER_CACHE["last_updated"] or (now - ROSTER_CACHE["last_updated"]) > timedelta(days=1):
-        await update_roster_cache()
+    if not ROSTER_CACHE["store"]:
+        ROSTER_CACHE_STATS["misses"] += 1
+    elif roster_is_stale():
+        ROSTER_CACHE_STATS["stale"] += 1
+    else:
+        ROSTER_CACHE_STATS["hits"] += 1
+
+    if roster_is_stale():
+        refresh_roster()
     
-    matches = []
-    search_name = name.lower()
-    for player in ROSTER_CACHE["players"]:
-        full_name = f"{player['firstName']} {player['lastName']}".lower()
-        if search_name in full_name:
-            matches.append(player)
-            
-    return matches
+    return ROSTER_CACHE["store"].search(name)
+
+def refresh_roster():
+    # Starts a background roster refresh unless one is already running
+    global _roster_refresh_task
+    if _roster_refresh_task is None or _roster_refresh_task.done():
+        _roster_refresh_task = profiling.detached(update_roster_cache())
+    return _roster_refresh_task
+
+async def roster_refresh_loop():
+    retry_delay, max_retry_delay = ROSTER_RETRY_DELAYS
+    while True:
+        try:
+            complete = await refresh_roster()
+        except Exception as e:
+            print(f"Roster refresh failed: {e}")
+            complete = False
+        if complete:
+            retry_delay = ROSTER_RETRY_DELAYS[0]
+            await asyncio.sleep(ROSTER_REFRESH_INTERVAL.total_seconds())
+        else:
+            await asyncio.sleep(retry_delay.total_seconds())
+            retry_delay = min(retry_delay * 2, max_retry_delay)
 
 async def update_roster_cache():
-    # Fetches all team rosters and updates the local cache.
-
-    headers = {"User-Agent": "Mozilla/5.0"}
-    async with aiohttp.ClientSession() as session:
-        # Get all teams
-        async with session.get("https://api-web.nhle.com/v1/standings/now", headers=headers) as response:
-            if response.status != 200:
-                return
-            data = await response.json()
-            teams = [s["teamAbbrev"]["default"] for s in data["standings"]]
-        
+    # Fetches all team rosters and updates the local cache. Returns False if the
+    # team list or any roster failed to load.
+    # Teams that fail keep their previous roster; unchanged rosters aren't re-parsed.
+
+    # Get all teams
+    data = await get_standings()
+    if not data:
+        print("Roster refresh failed: no standings to list the teams from")
+        return False
+    teams = [s["teamAbbrev"]["default"] for s in data["standings"]]
+    
+    semaphore = asyncio.Semaphore(ROSTER_FETCH_CONCURRENCY)
+    results = await asyncio.gather(*(refresh_team_roster(team, semaphore) for team in teams), return_exceptions=True)
+    changed = sum(1 for r in results if r is True)
+    failed = []
+    for team, result in zip(teams, results):
+        if result is None or isinstance(result, Exception):
+            failed.append(team)
+            print(f"Roster refresh for {team} failed: {'no data' if result is None else repr(result)}")
+    
+    if changed or not ROSTER_CACHE["store"]:
         all_players = []
-        tasks = []
         for team in teams:
-            tasks.append(fetch_team_roster(session, team, headers))
-        
-        results = await asyncio.gather(*tasks)
-        for roster in results:
-            if roster:
-                all_players.extend(roster)
-        
-        ROSTER_CACHE["players"] = all_players
+            entry = ROSTER_CACHE["teams"].get(team)
+            if entry:
+                all_players.extend(entry["players"])
+        ROSTER_CACHE["store"] = RosterStore(all_players)
+    if ROSTER_CACHE["store"]:
         ROSTER_CACHE["last_updated"] = datetime.now(timezone.utc)
+    return not failed
+
+async def refresh_team_roster(team_abbr, semaphore):
+    # True if the roster changed, False if unchanged, None if it couldn't be fetched
+    async with semaphore:
+        data = await fetch_team_roster(team_abbr)
+    if not data:
+        return None
+    previous = ROSTER_CACHE["teams"].get(team_abbr)
+    if previous and previous["raw"] is data:
+        # The response cache hands back the same payload on a 304, so nothing changed
+        return False
+    ROSTER_CACHE["teams"][team_abbr] = {"raw": data, "players": parse_team_roster(team_abbr, data)}
+    return True
 
-async def fetch_team_roster(session, team_abbr, headers):
+async def fetch_team_roster(team_abbr):
     url = f"https://api-web.nhle.com/v1/roster/{team_abbr}/current"
-    async with session.get(url, headers=headers) as response:
-        if response.status != 200:
-            return None
-        data = await response.json()
-        players = []
-        for pos in ["forwards", "defensemen", "goalies"]:
-            for p in data.get(pos, []):
-                players.append({
-                    "id": p["id"],
-                    "firstName": p["firstName"]["default"],
-                    "lastName": p["lastName"]["default"],
-                    "teamAbbrev": team_abbr,
-                    "position": p["positionCode"]
-                })
-        return players
+    return await fetch_json(url, ttl=CACHE_TTLS["roster"])
+
+def parse_team_roster(team_abbr, data):
+    players = []
+    for pos in ["forwards", "defensemen", "goalies"]:
+        for p in data.get(pos, []):
+            players.append(Player(
+                p["id"],
+                p["firstName"]["default"],
+                p["lastName"]["default"],
+                team_abbr,
+                p["positionCode"],
+            ))
+    return players
 
+@coalesce
 async def get_player_details(player_id: int):
     url = f"https://api-web.nhle.com/v1/player/{player_id}/landing"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as response:
-            if response.status != 200:
-                return None
-            return await response.json()
+    return await fetch_json(url, ttl=CACHE_TTLS["player"])
 
+@coalesce
 async def get_standings():
     url = "https://api-web.nhle.com/v1/standings/now"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as response:
-            if response.status != 200:
-                return None
-            return await response.json()
+    return await fetch_json(url, ttl=CACHE_TTLS["standings"])
 
 BASE_OLYMPIC_LEAGUES = {
     "men": "https://sports.core.api.espn.com/v2/sports/hockey/leagues/olympics-mens-ice-hockey",
@@ -336,78 +507,118 @@ IOC_TO_ALPHA2 = {
     "ROC": "RU", "OAR": "RU"
 }
 
-async def get_olympic_team_info(session, team_ref: str):
-    try:
-        async with session.get(team_ref, headers={"User-Agent": "Mozilla/5.0"}) as resp:
-            if resp.status != 200:
-                return {"name": "TBD", "abbreviation": "TBD", "alpha2": None}
-            team_data = await resp.json()
-            name = team_data.get("displayName") or team_data.get("name")
-            abbr = team_data.get("abbreviation") or team_data.get("shortDisplayName")
-            
-            alpha2 = None
-            if abbr and abbr != "TBD":
-                if abbr in IOC_TO_ALPHA2:
-                    alpha2 = IOC_TO_ALPHA2[abbr]
-                else:
-                    try:
-                        country = pycountry.countries.get(alpha_3=abbr)
-                        if country:
-                            alpha2 = country.alpha_2
-                    except:
-                        pass
-            
-            return {"name": name, "abbreviation": abbr, "alpha2": alpha2}
-    except Exception:
-        return {"name": "TBD", "abbreviation": "TBD", "alpha2": None}
+TBD_OLYMPIC_TEAM = {"name": "TBD", "abbreviation": "TBD", "alpha2": None}
+OLYMPIC_REF_CONCURRENCY = 8
+
+class OlympicCrawler:
+    """
+    Resolves the ESPN core API $ref graph (events -> competitions -> teams) with
+    bounded concurrency. Every $ref is fetched at most once per crawler, so a
+    team playing several games is only looked up once.
+    """
+
+    def __init__(self, concurrency=OLYMPIC_REF_CONCURRENCY):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.refs = {}
+
+    async def _fetch(self, url, ttl=None):
+        async with self.semaphore:
+            return await fetch_json(url, ttl=ttl)
+
+    async def fetch_ref(self, url, ttl=None):
+        task = self.refs.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url, ttl))
+            self.refs[url] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            return None
+
+    async def team_info(self, team_ref):
+        if not team_ref:
+            return TBD_OLYMPIC_TEAM
+        # Teams don't change during a tournament, so they also stay in the response cache
+        team_data = await self.fetch_ref(team_ref, ttl=CACHE_TTLS["olympic_team"])
+        if not team_data:
+            return TBD_OLYMPIC_TEAM
+        name = team_data.get("displayName") or team_data.get("name")
+        abbr = team_data.get("abbreviation") or team_data.get("shortDisplayName")
+        
+        alpha2 = None
+        if abbr and abbr != "TBD":
+            if abbr in IOC_TO_ALPHA2:
+                alpha2 = IOC_TO_ALPHA2[abbr]
+            else:
+                try:
+                    country = pycountry.countries.get(alpha_3=abbr)
+                    if country:
+                        alpha2 = country.alpha_2
+                except:
+                    pass
+        
+        return {"name": name, "abbreviation": abbr, "alpha2": alpha2}
+
+    async def competition(self, comp_ref, league_type, date_obj, event_date_utc):
+        comp_data = await self.fetch_ref(comp_ref)
+        if not comp_data:
+            return None
+        competitors = comp_data.get("competitors", [])
+        if not competitors:
+            return None
+        
+        # ESPN Core API usually lists home/away in competitors
+        home_comp = next((c for c in competitors if c.get("homeAway") == "home"), competitors[0])
+        away_comp = next((c for c in competitors if c.get("homeAway") == "away"), competitors[1] if len(competitors) > 1 else competitors[0])
+        
+        home_team, away_team = await asyncio.gather(
+            self.team_info(home_comp.get("team", {}).get("$ref")),
+            self.team_info(away_comp.get("team", {}).get("$ref")),
+        )
+        return {
+            "league": league_type,
+            "date": date_obj,
+            "time_utc": comp_data.get("date", event_date_utc),
+            "home": home_team,
+            "away": away_team,
+            "round": comp_data.get("description", "")
+        }
+
+    async def event(self, event_ref, league_type, date_obj):
+        event_data = await self.fetch_ref(event_ref)
+        if not event_data:
+            return []
+        event_date_utc = event_data.get("date")
+        games = await asyncio.gather(*(
+            self.competition(c["$ref"], league_type, date_obj, event_date_utc)
+            for c in event_data.get("competitions", [])
+        ))
+        return [g for g in games if g]
+
+    async def league_day(self, league_type, base_url, date_obj):
+        date_str = date_obj.strftime("%Y%m%d")
+        events_data = await self.fetch_ref(f"{base_url}/events?dates={date_str}&lang=en")
+        if not events_data:
+            return []
+        events = await asyncio.gather(*(
+            self.event(item["$ref"], league_type, date_obj)
+            for item in events_data.get("items", [])
+        ))
+        return [g for games in events for g in games]
+
+async def get_olympic_schedules(dates):
+    """
+    Crawls both leagues for every date in parallel.
+    Returns {date: [game, ...]} in the order the dates were given.
+    """
+    crawler = OlympicCrawler()
+    keys = [(d, league, base) for d in dates for league, base in BASE_OLYMPIC_LEAGUES.items()]
+    results = await asyncio.gather(*(crawler.league_day(league, base, d) for d, league, base in keys))
+    schedules = {d: [] for d in dates}
+    for (d, _, _), games in zip(keys, results):
+        schedules[d].extend(games)
+    return schedules
 
 async def get_olympic_schedule(date_obj):
-    date_str = date_obj.strftime("%Y%m%d")
-    headers = {"User-Agent": "Mozilla/5.0"}
-    all_events = []
-    
-    async with aiohttp.ClientSession() as session:
-        for league_type, base_url in BASE_OLYMPIC_LEAGUES.items():
-            events_url = f"{base_url}/events?dates={date_str}&lang=en"
-            async with session.get(events_url, headers=headers) as resp:
-                if resp.status != 200:
-                    continue
-                events_data = await resp.json()
-                
-                items = events_data.get("items", [])
-                for item in items:
-                    async with session.get(item["$ref"], headers=headers) as e_resp:
-                        if e_resp.status != 200:
-                            continue
-                        event_data = await e_resp.json()
-                        event_date_utc = event_data.get("date")
-                        
-                        competitions_refs = event_data.get("competitions", [])
-                        for comp_ref in competitions_refs:
-                            async with session.get(comp_ref["$ref"], headers=headers) as c_resp:
-                                if c_resp.status != 200:
-                                    continue
-                                comp_data = await c_resp.json()
-                                round_desc = comp_data.get("description", "")
-                                comp_date = comp_data.get("date", event_date_utc)
-                                competitors = comp_data.get("competitors", [])
-                                
-                                if not competitors:
-                                    continue
-                                
-                                # ESPN Core API usually lists home/away in competitors
-                                home_comp = next((c for c in competitors if c.get("homeAway") == "home"), competitors[0])
-                                away_comp = next((c for c in competitors if c.get("homeAway") == "away"), competitors[1] if len(competitors) > 1 else competitors[0])
-                                
-                                home_team = await get_olympic_team_info(session, home_comp.get("team", {}).get("$ref")) if home_comp.get("team") else {"name": "TBD", "abbreviation": "TBD", "alpha2": None}
-                                away_team = await get_olympic_team_info(session, away_comp.get("team", {}).get("$ref")) if away_comp.get("team") else {"name": "TBD", "abbreviation": "TBD", "alpha2": None}
-                                
-                                all_events.append({
-                                    "league": league_type,
-                                    "date": date_obj,
-                                    "time_utc": comp_date,
-                                    "home": home_team,
-                                    "away": away_team,
-                                    "round": round_desc
-                                })
-    return all_events
+    schedules = await get_olympic_schedules([date_obj])
+    return schedules[date_obj]
@@ -0,0 +1,111 @@
+import re
+import unicodedata
+from collections import Counter
+
+# Letters NFKD doesn't decompose into a base letter + accent
+_FOLD_TABLE = str.maketrans({"ø": "o", "ł": "l", "đ": "d", "æ": "ae", "œ": "oe", "ß": "ss"})
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Minimum share of each query token's trigrams a name must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+def fold_name(text: str):
+    """
+    Lowercases and strips accents so "Stützle" and "stutzle" compare equal.
+    """
+    text = unicodedata.normalize("NFKD", text.lower().translate(_FOLD_TABLE))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def tokenize(folded: str):
+    return _TOKEN_RE.findall(folded)
+
+def trigrams(folded: str):
+    padded = f"  {' '.join(tokenize(folded))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def token_trigrams(token: str):
+    # One leading space, so a token matches wherever it sits in a name's trigrams
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class PlayerIndex:
+    """
+    Search index over roster_store.Player records, built once per roster refresh.
+    Results are ranked: exact full name, then last-name prefix, then names whose
+    tokens all start with the query tokens. Fuzzy (trigram) matches are only
+    returned when none of those tiers has a hit, so typos still resolve without
+    padding an unambiguous query with near misses.
+    """
+
+    def __init__(self, players):
+        self.players = players
+        self.full_names = []
+        self.last_names = []
+        self.exact = {}
+        self.prefixes = {}
+        self.grams = {}
+
+        for i, player in enumerate(players):
+            full = player.folded_name
+            self.full_names.append(full)
+            self.last_names.append(player.folded_last)
+            self.exact.setdefault(full, []).append(i)
+
+            for token in full.split():
+                for n in range(1, len(token) + 1):
+                    self.prefixes.setdefault(token[:n], set()).add(i)
+
+            for g in trigrams(full):
+                self.grams.setdefault(g, []).append(i)
+
+    def __len__(self):
+        return len(self.players)
+
+    def _sort_key(self, i):
+        return (self.last_names[i], self.full_names[i])
+
+    def search(self, query: str, limit: int = None):
+        folded = fold_name(query).strip()
+        tokens = tokenize(folded)
+        if not tokens:
+            return []
+        normalized = " ".join(tokens)
+
+        exact = self.exact.get(normalized, [])
+
+        # Every query token must prefix some token of the name
+        candidates = None
+        for token in tokens:
+            postings = self.prefixes.get(token, set())
+            candidates = postings if candidates is None else candidates & postings
+            if not candidates:
+                break
+        candidates = candidates or set()
+
+        seen = set(exact)
+        last_prefix = sorted((i for i in candidates if i not in seen and self.last_names[i].startswith(normalized)), key=self._sort_key)
+        seen.update(last_prefix)
+        token_prefix = sorted((i for i in candidates if i not in seen), key=self._sort_key)
+
+        ranked = exact + last_prefix + token_prefix
+        if ranked:
+            return [self.players[i] for i in ranked[:limit]]
+
+        # Fuzzy: trigram containment, which also catches substrings like "david" in "mcdavid".
+        # Scored per query token and every token must clear the threshold, so a matching
+        # first name can't carry a made-up last name ("connor smith")
+        scores = None
+        for token in tokens:
+            token_grams = token_trigrams(token)
+            overlaps = Counter()
+            for g in token_grams:
+                for i in self.grams.get(g, ()):
+                    overlaps[i] += 1
+            passed = {i: overlap / len(token_grams) for i, overlap in overlaps.items() if overlap / len(token_grams) >= FUZZY_THRESHOLD}
+            scores = passed if scores is None else {i: score + passed[i] for i, score in scores.items() if i in passed}
+            if not scores:
+                return []
+        fuzzy = sorted((-score, self._sort_key(i), i) for i, score in scores.items())
+
+        ranked = [i for _, _, i in fuzzy]
+        return [self.players[i] for i in ranked[:limit]]
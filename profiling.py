@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+# Opt-in span trees for single command invocations. PROFILE_COMMANDS lists the
+# commands profiled on every call ("nextgames,player" or "all"); admins can also
+# profile one invocation with !profile. Trees are written to PROFILE_DIR as JSON
+# and as collapsed stacks ("a;b;c <microseconds>") for flamegraph.pl / speedscope.
+PROFILE_COMMANDS = {c.strip() for c in os.getenv("PROFILE_COMMANDS", "").split(",") if c.strip()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".cache/profiles")
+
+_current_span = ContextVar("current_span", default=None)
+
+class Span:
+    __slots__ = ("name", "start", "end", "attrs", "children")
+
+    def __init__(self, name, start=None, attrs=None):
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.attrs = attrs or {}
+        self.children = []
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin):
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "children": [c.to_dict(origin) for c in self.children],
+        }
+
+class _NullSpan:
+    # Handed out when profiling is off so call sites can set attributes unconditionally
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def enabled_for(command):
+    return "all" in PROFILE_COMMANDS or command in PROFILE_COMMANDS
+
+def active():
+    return _current_span.get() is not None
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Records a child of the current span. Spans started in tasks created inside
+    it (asyncio.gather, create_task) nest under it, since tasks copy the context.
+    A no-op outside a profiled command.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield _NULL_SPAN
+        return
+    child = Span(name, attrs=attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+def add_span(name, start, duration, parent=None, **attrs):
+    # For work timed elsewhere (e.g. inside a render worker) and reported back
+    parent = parent or _current_span.get()
+    if parent is None:
+        return None
+    child = Span(name, start=start, attrs=attrs)
+    child.end = start + duration
+    parent.children.append(child)
+    return child
+
+def detached(coro):
+    """
+    Starts coro as a task outside the current span tree, for background work
+    the caller doesn't wait on (e.g. a stale-cache refresh). Otherwise its spans
+    would be charged to whichever command happened to start it.
+    """
+    context = copy_context()
+    context.run(_current_span.set, None)
+    return asyncio.create_task(coro, context=context)
+
+def start(name, **attrs):
+    """
+    Starts a root span in the current context. Returns (root, token) for finish().
+    """
+    root = Span(name, attrs=attrs)
+    return root, _current_span.set(root)
+
+def finish(profile):
+    root, token = profile
+    root.end = time.perf_counter()
+    _current_span.reset(token)
+    return root
+
+def collapsed_stacks(root):
+    """
+    Self time per stack in microseconds. Concurrent children can add up to more
+    than their parent, in which case the parent's self time is clamped at zero.
+    """
+    stacks = {}
+
+    def walk(span, prefix):
+        path = f"{prefix};{span.name}" if prefix else span.name
+        self_time = span.duration - sum(c.duration for c in span.children)
+        stacks[path] = stacks.get(path, 0) + max(0, int(self_time * 1_000_000))
+        for child in span.children:
+            walk(child, path)
+
+    walk(root, "")
+    return [f"{path} {micros}" for path, micros in stacks.items() if micros]
+
+def format_tree(root, max_lines=25):
+    lines = []
+
+    def walk(span, depth):
+        if len(lines) >= max_lines:
+            return
+        attrs = " ".join(f"{k}={v}" for k, v in span.attrs.items())
+        lines.append(f"{'  ' * depth}{span.name} {span.duration * 1000:.1f}ms {attrs}".rstrip())
+        for child in sorted(span.children, key=lambda c: c.start):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+def dump(root, directory=PROFILE_DIR):
+    """
+    Writes the tree as {timestamp}-{name}.json and .folded. Returns both paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+    stem = os.path.join(directory, f"{stamp}-{root.name.replace(' ', '_')}")
+    json_path = f"{stem}.json"
+    folded_path = f"{stem}.folded"
+    with open(json_path, "w") as f:
+        json.dump(root.to_dict(root.start), f, indent=2, default=str)
+    with open(folded_path, "w") as f:
+        f.write("\n".join(collapsed_stacks(root)) + "\n")
+    return json_path, folded_path
@@ -0,0 +1,55 @@
+import sys
+from player_index import PlayerIndex, fold_name, tokenize
+
+class Player:
+    """
+    Compact roster entry. Team and position codes are interned so the ~800
+    players share a handful of string objects, and the folded search names
+    are computed once here instead of on every query.
+    """
+    __slots__ = ("id", "first_name", "last_name", "team", "position", "folded_name", "folded_last")
+
+    def __init__(self, player_id, first_name, last_name, team, position):
+        self.id = player_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.team = sys.intern(team)
+        self.position = sys.intern(position)
+        self.folded_name = " ".join(tokenize(fold_name(f"{first_name} {last_name}")))
+        self.folded_last = " ".join(tokenize(fold_name(last_name)))
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+    def __repr__(self):
+        return f"Player({self.id}, {self.full_name!r}, {self.team})"
+
+class RosterStore:
+    """
+    Immutable league roster snapshot with lookups by id, by team and by name.
+    A refresh builds a new store and swaps it in, so readers never see a partial one.
+    """
+
+    def __init__(self, players=()):
+        self.players = tuple(players)
+        self.by_id = {p.id: p for p in self.players}
+        self.by_team = {}
+        for p in self.players:
+            self.by_team.setdefault(p.team, []).append(p)
+        self.index = PlayerIndex(self.players)
+
+    def __len__(self):
+        return len(self.players)
+
+    def __iter__(self):
+        return iter(self.players)
+
+    def get(self, player_id):
+        return self.by_id.get(player_id)
+
+    def team(self, team_abbr):
+        return self.by_team.get(team_abbr, [])
+
+    def search(self, name, limit=None):
+        return self.index.search(name, limit)
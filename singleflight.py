@@ -0,0 +1,31 @@
+import asyncio
+import functools
+
+# key -> in-flight task shared by every concurrent caller with that key
+_IN_FLIGHT = {}
+
+async def single_flight(key, factory):
+    """
+    Runs factory() once per key at a time. Concurrent callers with the same
+    key await the same task instead of starting their own.
+    """
+    task = _IN_FLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _IN_FLIGHT[key] = task
+
+        def _forget(t):
+            if _IN_FLIGHT.get(key) is t:
+                del _IN_FLIGHT[key]
+        task.add_done_callback(_forget)
+    # Shielded so one caller giving up doesn't cancel the work for the others
+    return await asyncio.shield(task)
+
+def coalesce(fn):
+    """
+    Decorator for coroutine functions with hashable positional arguments.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args):
+        return await single_flight((fn.__qualname__,) + args, lambda: fn(*args))
+    return wrapper
@@ -1,42 +1,288 @@
+import io
+import json
+import contextlib
+import time
 import asyncio
-from nhl_api import fetch_next_game, search_player, get_player_details, is_on_espn_plus, get_espn_scoreboard
+import tempfile
+from datetime import datetime
+from nhl_api import fetch_next_game, search_player, update_roster_cache, get_player_details, is_on_espn_plus, get_espn_scoreboard, build_scoreboard_index, build_game
+from http_client import close_session
+from roster_store import Player, RosterStore
+from mock_upstream import stub_image
+import asset_store
+import http_client
+import image_generator
+import nhl_api
+import profiling
 
 async def test_espn_plus_logic():
     print("\n--- Testing ESPN+ Logic ---")
     
     # Case 1: Regional US game (Heuristic fallback)
-    game_reg = {"homeTeam": {"abbrev": "BUF"}, "awayTeam": {"abbrev": "MTL"}, "tvBroadcasts": [{"network": "MSG-B", "market": "H"}]}
+    game_reg = build_game({"homeTeam": {"abbrev": "BUF"}, "awayTeam": {"abbrev": "MTL"}, "startTimeUTC": "2026-01-16T00:00:00Z", "tvBroadcasts": [{"network": "MSG-B", "market": "H"}]}, "BUF")
     print(f"Regional US game on ESPN+ (heuristic): {is_on_espn_plus(game_reg)}") # True
     
     # Case 2: ESPN National (Heuristic fallback)
-    game_espn = {"homeTeam": {"abbrev": "PIT"}, "awayTeam": {"abbrev": "PHI"}, "tvBroadcasts": [{"network": "ESPN", "market": "N"}]}
+    game_espn = build_game({"homeTeam": {"abbrev": "PIT"}, "awayTeam": {"abbrev": "PHI"}, "startTimeUTC": "2026-01-16T00:00:00Z", "tvBroadcasts": [{"network": "ESPN", "market": "N"}]}, "PIT")
     print(f"ESPN National on ESPN+ (heuristic): {is_on_espn_plus(game_espn)}") # True
     
     # Case 3: TNT Exclusive (Heuristic fallback)
-    game_tnt = {"homeTeam": {"abbrev": "BUF"}, "awayTeam": {"abbrev": "CAR"}, "tvBroadcasts": [{"network": "TNT", "market": "N"}]}
+    game_tnt = build_game({"homeTeam": {"abbrev": "BUF"}, "awayTeam": {"abbrev": "CAR"}, "startTimeUTC": "2026-01-16T00:00:00Z", "tvBroadcasts": [{"network": "TNT", "market": "N"}]}, "BUF")
     print(f"TNT Exclusive on ESPN+ (heuristic): {is_on_espn_plus(game_tnt)}") # False
     
     # Case 4: ESPN API Match - ESPN+ listed
     scoreboard_data = {
         "events": [{
             "competitions": [{
+                "date": "2026-01-16T00:00Z",
                 "competitors": [{"team": {"abbreviation": "BUF"}}, {"team": {"abbreviation": "MTL"}}],
                 "broadcasts": [{"names": ["ESPN+", "MSGB"]}]
             }]
         }]
     }
-    print(f"ESPN API Match (ESPN+ present): {is_on_espn_plus(game_reg, scoreboard_data)}") # True
+    print(f"ESPN API Match (ESPN+ present): {is_on_espn_plus(game_reg, build_scoreboard_index(scoreboard_data))}") # True
     
     # Case 5: ESPN API Match - ESPN+ NOT listed (e.g. TNT game)
     scoreboard_tnt = {
         "events": [{
             "competitions": [{
+                "date": "2026-01-16T00:00Z",
                 "competitors": [{"team": {"abbreviation": "BUF"}}, {"team": {"abbreviation": "CAR"}}],
                 "broadcasts": [{"names": ["TNT", "HBO Max"]}]
             }]
         }]
     }
-    print(f"ESPN API Match (ESPN+ absent): {is_on_espn_plus(game_tnt, scoreboard_tnt)}") # False
+    print(f"ESPN API Match (ESPN+ absent): {is_on_espn_plus(game_tnt, build_scoreboard_index(scoreboard_tnt))}") # False
+
+    # Case 6: ESPN abbreviations (LA, TB, ...) are mapped to NHL ones at ingest
+    game_lak = build_game({"homeTeam": {"abbrev": "LAK"}, "awayTeam": {"abbrev": "TBL"}, "startTimeUTC": "2026-01-16T03:30:00Z", "tvBroadcasts": [{"network": "TNT", "market": "N"}]}, "LAK")
+    scoreboard_lak = {
+        "events": [{
+            "date": "2026-01-16T03:30Z",
+            "competitions": [{
+                "competitors": [{"team": {"abbreviation": "LA"}}, {"team": {"abbreviation": "TB"}}],
+                "broadcasts": [{"names": ["ESPN+"]}]
+            }]
+        }]
+    }
+    print(f"ESPN API Match (mapped abbreviations): {is_on_espn_plus(game_lak, build_scoreboard_index(scoreboard_lak))}") # True
+
+def test_player_index():
+    print("\n--- Testing Player Index ---")
+    store = RosterStore([
+        Player(1, "Tim", "Stützle", "OTT", "C"),
+        Player(2, "Juraj", "Slafkovský", "MTL", "L"),
+        Player(3, "Connor", "McDavid", "EDM", "C"),
+        Player(4, "Connor", "Bedard", "CHI", "C"),
+        Player(5, "David", "Pastrnak", "BOS", "R"),
+    ])
+    print(f"Accent-insensitive 'stutzle': {[p.last_name for p in store.search('stutzle')]}") # ['Stützle']
+    print(f"Accent-insensitive 'slafkovsky': {[p.last_name for p in store.search('slafkovsky')]}") # ['Slafkovský']
+    print(f"Exact match ranked first: {[p.last_name for p in store.search('connor mcdavid')]}") # ['McDavid']
+    print(f"Last-name prefix 'mcd': {[p.last_name for p in store.search('mcd')]}") # ['McDavid']
+    print(f"Unambiguous 'McDavid': {[p.last_name for p in store.search('McDavid')]}") # ['McDavid']
+    print(f"Typo 'mcdavdi': {[p.last_name for p in store.search('mcdavdi')]}") # ['McDavid']
+    print(f"Typo 'conor mcdavdi': {[p.last_name for p in store.search('conor mcdavdi')]}") # ['McDavid']
+    print(f"Made-up 'Connor Smith': {[p.last_name for p in store.search('Connor Smith')]}") # []
+    assert store.search("Connor Smith") == []
+    assert [p.last_name for p in store.search("conor mcdavdi")] == ["McDavid"]
+    print(f"Lookup by id / team: {store.get(3).full_name} / {[p.last_name for p in store.team('CHI')]}") # Connor McDavid / ['Bedard']
+
+def test_game_record():
+    print("\n--- Testing Game Record ---")
+    raw = {
+        "id": 2025030115, "gameType": 3, "startTimeUTC": "2026-04-28T23:00:00Z",
+        "homeTeam": {"abbrev": "BUF"}, "awayTeam": {"abbrev": "BOS"},
+        "seriesStatus": {"seriesTitle": "1st Round", "topSeedWins": 2, "bottomSeedWins": 2, "gameNumberOfSeries": 5},
+        "tvBroadcasts": [{"network": "MSG-B", "market": "H"}, {"network": "NESN", "market": "A"}, {"network": "TNT", "market": "N"}]
+    }
+    game = build_game(raw, "BUF")
+    print(f"Opponent / home: {game.opponent_abbr} / {game.is_home}") # BOS / True
+    print(f"Filtered broadcasts: {game.broadcasts}") # ('MSG-B', 'TNT')
+    print(f"Playoff lines: {game.playoff_lines()}") # ['Game 5', 'Series Tied 2-2']
+
+def test_render_cache_missing_asset():
+    print("\n--- Testing Render Cache With A Failed Logo ---")
+    with open("fixtures/standings.json") as f:
+        standings = json.load(f)
+    cdn_up = False
+
+    async def flaky_fetch_bytes(url):
+        # The BUF logo download fails until the CDN "recovers"
+        if "/buf.png" in url and not cdn_up:
+            return None
+        return stub_image(url)
+
+    async def run():
+        nonlocal cdn_up
+        first = await image_generator.generate_standings_image(standings)
+        cdn_up = True
+        second = await image_generator.generate_standings_image(standings)
+        third = await image_generator.generate_standings_image(standings)
+        return first, second, third
+
+    original_fetch = image_generator.fetch_bytes
+    original_dir = asset_store.ASSET_CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        asset_store.ASSET_CACHE_DIR = tmp
+        image_generator.fetch_bytes = flaky_fetch_bytes
+        image_generator.RENDER_CACHE.clear()
+        image_generator.LOGO_CACHE.clear()
+        image_generator.LOGO_ATLAS = None
+        stats = image_generator.RENDER_CACHE_STATS
+        before = dict(stats)
+        try:
+            first, second, third = asyncio.run(run())
+        finally:
+            image_generator.fetch_bytes = original_fetch
+            asset_store.ASSET_CACHE_DIR = original_dir
+            image_generator.shutdown_render_executor()
+    misses = stats["misses"] - before["misses"]
+    hits = stats["hits"] - before["hits"]
+    print(f"Rendered each time / misses / hits: {all((first, second, third))} / {misses} / {hits}") # True / 2 / 1
+    print(f"BUF logo cached after recovery: {'buf' in image_generator.LOGO_CACHE}") # True
+    assert all((first, second, third))
+    assert (misses, hits) == (2, 1)
+    assert "buf" in image_generator.LOGO_CACHE
+
+def test_render_cache_coalesced():
+    print("\n--- Testing Render Cache Coalescing ---")
+    started = 0
+
+    async def build():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.01)
+        return io.BytesIO(b"image"), True
+
+    async def run():
+        return await asyncio.gather(*(image_generator.cached_render("test", ["coalesce"], build) for _ in range(3)))
+
+    stats = image_generator.RENDER_CACHE_STATS
+    before = dict(stats)
+    image_generator.RENDER_CACHE.clear()
+    buffers = asyncio.run(run())
+    counts = {k: stats[k] - before[k] for k in stats}
+    print(f"Renders started / stats: {started} / {counts}") # 1 / {'hits': 0, 'misses': 1, 'coalesced': 2}
+    assert started == 1 and all(b.getvalue() == b"image" for b in buffers)
+    assert counts == {"hits": 0, "misses": 1, "coalesced": 2}
+
+def test_profile_excludes_background_refreshes():
+    print("\n--- Testing Profiles Exclude Background Refreshes ---")
+    async def slow_refresh(*args):
+        await asyncio.sleep(0.01)
+        with profiling.span("background_fetch"):
+            await asyncio.sleep(0)
+
+    async def run():
+        profile = profiling.start("player")
+        await search_player("mcdavid")
+        nhl_api._schedule_refresh("BUF", slow_refresh)
+        root = profiling.finish(profile)
+        at_finish = len(root.children)
+        await asyncio.gather(nhl_api._roster_refresh_task, nhl_api._SCHEDULE_REFRESHES["BUF"])
+        return at_finish, len(root.children)
+
+    original = nhl_api.update_roster_cache
+    last_updated = nhl_api.ROSTER_CACHE["last_updated"]
+    nhl_api.update_roster_cache = slow_refresh
+    nhl_api.ROSTER_CACHE["last_updated"] = None
+    try:
+        at_finish, after = asyncio.run(run())
+    finally:
+        nhl_api.update_roster_cache = original
+        nhl_api.ROSTER_CACHE["last_updated"] = last_updated
+        nhl_api._roster_refresh_task = None
+        nhl_api._SCHEDULE_REFRESHES.pop("BUF", None)
+    print(f"Child spans at finish / after refreshes: {at_finish} / {after}") # 0 / 0
+    assert after == at_finish == 0
+
+def test_breaker_probe_released():
+    print("\n--- Testing Half-Open Probe Release ---")
+    host = "probe.test"
+    breaker = http_client.get_breaker(host)
+    breaker.opened_at = time.monotonic() - http_client.BREAKER_COOLDOWN
+
+    async def broken_get(*args):
+        raise RuntimeError("Session is closed")
+
+    async def run():
+        try:
+            await http_client._request(f"https://{host}/")
+        except RuntimeError as e:
+            return str(e)
+        finally:
+            await close_session()
+
+    original = http_client._get
+    http_client._get = broken_get
+    try:
+        error = asyncio.run(run())
+    finally:
+        http_client._get = original
+        http_client.BREAKERS.pop(host, None)
+    released = not breaker.probing
+    print(f"Error / probe slot released / next probe allowed: {error} / {released} / {breaker.allow()}") # Session is closed / True / True
+    assert error == "Session is closed" and released
+
+def test_request_deadlines():
+    print("\n--- Testing Per-Host Request Deadlines ---")
+    api = http_client.request_deadline("api-web.nhle.com")
+    cdn = http_client.request_deadline("a.espncdn.com")
+    print(f"NHL API / logo CDN: {api} / {cdn}") # 8.0 / 15
+    assert cdn == http_client.DEFAULT_TIMEOUT.total and api == http_client.REQUEST_DEADLINE
+
+def test_roster_refresh_failures():
+    print("\n--- Testing Roster Refresh Failures ---")
+    standings = {"standings": [{"teamAbbrev": {"default": t}} for t in ("BUF", "SEA", "DAL")]}
+    roster = {"forwards": [{"id": 1, "firstName": {"default": "Tage"}, "lastName": {"default": "Thompson"}, "positionCode": "C"}]}
+
+    async def fake_standings():
+        return standings
+
+    async def fake_roster(team_abbr):
+        if team_abbr == "SEA":
+            raise ValueError("bad payload")
+        return None if team_abbr == "DAL" else roster
+
+    original = (nhl_api.get_standings, nhl_api.fetch_team_roster, dict(nhl_api.ROSTER_CACHE))
+    nhl_api.get_standings, nhl_api.fetch_team_roster = fake_standings, fake_roster
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            complete = asyncio.run(update_roster_cache())
+        players = len(nhl_api.ROSTER_CACHE["store"])
+    finally:
+        nhl_api.get_standings, nhl_api.fetch_team_roster = original[:2]
+        nhl_api.ROSTER_CACHE.clear()
+        nhl_api.ROSTER_CACHE.update(original[2])
+        nhl_api.ROSTER_CACHE["teams"].pop("BUF", None)
+    print(f"Complete / players / log: {complete} / {players} / {log.getvalue().splitlines()}") # False / 1 / SEA and DAL failures
+    assert complete is False and players == 1
+    assert "SEA failed: ValueError('bad payload')" in log.getvalue() and "DAL failed: no data" in log.getvalue()
+
+def test_scoreboard_index_pruning():
+    print("\n--- Testing Scoreboard Index Pruning ---")
+    today = datetime.now(nhl_api.EASTERN).strftime("%Y%m%d")
+
+    async def fake_scoreboard(date_range):
+        return {"events": []}
+
+    original = nhl_api.get_espn_scoreboard
+    nhl_api.get_espn_scoreboard = fake_scoreboard
+    nhl_api.SCOREBOARD_INDEX.clear()
+    nhl_api.SCOREBOARD_INDEX.update({
+        "20200101": {"games": {}, "expires": 0},
+        "20200102": {"games": {}, "expires": time.monotonic() + 60},
+    })
+    try:
+        asyncio.run(nhl_api.get_espn_scoreboard_index([today]))
+        kept = sorted(nhl_api.SCOREBOARD_INDEX)
+    finally:
+        nhl_api.get_espn_scoreboard = original
+        nhl_api.SCOREBOARD_INDEX.clear()
+    print(f"Dates kept: {kept}") # unexpired 20200102 and today
+    assert kept == ["20200102", today]
 
 async def test_espn_api_fetch():
     print("\n--- Testing ESPN API Fetch ---")
@@ -51,6 +297,8 @@ async def test_espn_api_fetch():
 
 async def test_api():
     await test_espn_plus_logic()
+    test_player_index()
+    test_game_record()
     await test_espn_api_fetch()
     
     teams = ["BUF", "SEA", "DAL"]
@@ -61,15 +309,26 @@ async def test_api():
     
     print("\n--- Testing Player Search ---")
     player_name = "McDavid"
+    await update_roster_cache()
     matches = await search_player(player_name)
     if matches:
         p = matches[0]
-        print(f"Found: {p['firstName']} {p['lastName']} ({p['teamAbbrev']})")
-        details = await get_player_details(p['id'])
+        print(f"Found: {p.full_name} ({p.team})")
+        details = await get_player_details(p.id)
         if details:
-            print(f"Successfully fetched details for {p['lastName']}")
+            print(f"Successfully fetched details for {p.last_name}")
     else:
         print(f"No matches for {player_name}")
 
+    await close_session()
+
 if __name__ == "__main__":
+    # These run their own event loops, so they can't be awaited from test_api
+    test_render_cache_missing_asset()
+    test_render_cache_coalesced()
+    test_profile_excludes_background_refreshes()
+    test_breaker_probe_released()
+    test_request_deadlines()
+    test_roster_refresh_failures()
+    test_scoreboard_index_pruning()
     asyncio.run(test_api())